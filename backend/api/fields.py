@@ -0,0 +1,90 @@
+from collections.abc import Mapping
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.fields import ImageField
+from rest_framework.relations import (MANY_RELATION_KWARGS,
+                                      ManyRelatedField,
+                                      PrimaryKeyRelatedField)
+from rest_framework.serializers import ListSerializer
+
+
+class ImageVariantField(ImageField):
+    """Ссылка на уменьшенную копию изображения рецепта, а пока копия
+    не готова — на исходное изображение."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return super().get_attribute(instance) or instance.image
+
+
+class BulkPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    """Поле первичного ключа, которое берёт объекты из словаря,
+    заранее загруженного одним запросом методом `prefetch`.
+
+    Ошибки для отдельных значений совпадают с ошибками
+    PrimaryKeyRelatedField."""
+
+    prefetched = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def _to_pk(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        if isinstance(data, bool):
+            raise TypeError
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except DjangoValidationError:
+            raise ValueError
+
+    def prefetch(self, values):
+        pks = set()
+        for value in values:
+            try:
+                pks.add(self._to_pk(value))
+            except (TypeError, ValueError):
+                continue
+        self.prefetched = self.get_queryset().in_bulk(pks)
+
+    def to_internal_value(self, data):
+        if self.prefetched is None:
+            return super().to_internal_value(data)
+        try:
+            return self.prefetched[self._to_pk(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class BulkManyRelatedField(ManyRelatedField):
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child_relation.prefetch(data)
+        return super().to_internal_value(data)
+
+
+class BulkListSerializer(ListSerializer):
+    """Загружает объекты для поля `bulk_field` всех элементов списка
+    одним запросом перед их валидацией."""
+
+    bulk_field = 'id'
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child.fields[self.bulk_field].prefetch(
+                item.get(self.bulk_field) for item in data
+                if isinstance(item, Mapping)
+            )
+        return super().to_internal_value(data)
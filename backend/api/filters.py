@@ -15,21 +15,34 @@ class IngredientFilter(filters.FilterSet):
 class RecipeFilter(filters.FilterSet):
     tags = filters.ModelMultipleChoiceFilter(field_name='tags__slug',
                                              queryset=Tag.objects.all(),
-                                             to_field_name='slug')
+                                             to_field_name='slug',
+                                             method='_tags')
     is_favorited = filters.BooleanFilter(method='_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='_in_shopping_cart')
+    search = filters.CharFilter(method='_search')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'search')
+
+    def _tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.with_any_tag(value)
 
     def _is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return self.queryset.filter(favorites__user=self.request.user)
+            return queryset.favorited_by(self.request.user)
         return queryset
 
     def _in_shopping_cart(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return self.queryset.filter(shoppingcarts__user=self.request.user)
+            return queryset.in_shopping_cart_of(self.request.user)
         return queryset
+
+    def _search(self, queryset, name, value):
+        """Сортирует выдачу по релевантности, поэтому RecipePaginator
+        не сочетает поиск с курсорной пагинацией."""
+        return queryset.search(value)
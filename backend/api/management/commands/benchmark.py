@@ -0,0 +1,95 @@
+import json
+from tempfile import TemporaryDirectory
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from core.benchmarks import BENCHMARKS, compare_results, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Run API hot path benchmarks against a throwaway test '
+            'database and optionally compare them with a saved run')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales',
+            nargs='+',
+            type=int,
+            default=(10, 100, 1000),
+            help='Numbers of recipes to run the benchmarks with',
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=10,
+            help='Number of measured rounds for every benchmark',
+        )
+        parser.add_argument(
+            '--only',
+            nargs='+',
+            choices=sorted(BENCHMARKS),
+            help='Run only the given benchmarks',
+        )
+        parser.add_argument(
+            '--output',
+            help='Path of the JSON file to save the results to',
+        )
+        parser.add_argument(
+            '--compare',
+            help='Path of a saved JSON run to compare the results with',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=20.0,
+            help='Allowed median slowdown against the saved run, percent',
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with TemporaryDirectory() as media_root, override_settings(
+                MEDIA_ROOT=media_root,
+                CACHES={'default': {
+                    'BACKEND':
+                        'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCATION': 'benchmarks',
+                    'OPTIONS': {'MAX_ENTRIES': 100_000},
+                }},
+            ):
+                results = run_benchmarks(options['scales'],
+                                         options['rounds'],
+                                         options['only'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        for item in results['benchmarks']:
+            stats = item['stats']
+            self.stdout.write(
+                f'{item["name"]:<28}{item["scale"]:>8}'
+                f'{stats["median"] * 1000:>12.2f} ms'
+                f'{stats["stddev"] * 1000:>10.2f} ms'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2)
+        if baseline is None:
+            return
+        regressions = compare_results(results, baseline,
+                                      options['threshold'])
+        for name, scale, change in regressions:
+            self.stderr.write(f'{name} at {scale}: +{change:.1f}%')
+        if regressions:
+            raise CommandError(
+                f'{len(regressions)} benchmarks are slower than the saved '
+                f'run by more than {options["threshold"]}%'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'No regressions against the saved run'))
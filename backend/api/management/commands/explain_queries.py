@@ -0,0 +1,212 @@
+import re
+from itertools import takewhile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from api.pagination import RecipeCursorPaginator
+from api.serializers import RecipeValuesSerializer
+from api.views import RecipeViewSet, UserViewSet
+from recipes.models import Recipe, ShoppingListItem, Tag, TimelineEntry
+from users.models import User
+
+POSTGRESQL_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+POSTGRESQL_INDEX_SCAN = re.compile(
+    r'Index (?:Only )?Scan (?:Backward )?using (\w+) on (\w+)'
+)
+SQLITE_SCAN = re.compile(
+    r'SCAN (?:TABLE )?(\w+)(?: USING (?:COVERING )?INDEX (\w+))?$'
+)
+SQLITE_SUBQUERY = re.compile(r'(?:CO-ROUTINE|MATERIALIZE) (\w+)')
+# Страницы без фильтров читают индекс по порядку сортировки и
+# останавливаются на LIMIT, поэтому полный проход индекса для них
+# не отмечается.
+# Фильтр по тэгам тоже идёт по индексу даты: тэгов единицы и каждый
+# покрывает заметную долю рецептов, поэтому EXISTS по
+# TagRecipe(tag, recipe) набирает LIMIT строк быстрее, чем выборка
+# всех рецептов тэга с последующей сортировкой.
+ORDERED_INDEX_SCANS = ('recipes: list', 'recipes: values list',
+                       'recipes: tags', 'users: list')
+
+
+def _find_postgresql_scans(plan):
+    scans = dict.fromkeys(POSTGRESQL_SEQ_SCAN.findall(plan))
+    lines = plan.splitlines()
+    for number, line in enumerate(lines):
+        match = POSTGRESQL_INDEX_SCAN.search(line)
+        if match is None:
+            continue
+        details = takewhile(lambda detail: '->' not in detail,
+                            lines[number + 1:])
+        if not any('Index Cond:' in detail for detail in details):
+            scans.setdefault(match.group(2), match.group(1))
+    return scans
+
+
+def _find_sqlite_scans(plan):
+    subqueries = set(SQLITE_SUBQUERY.findall(plan))
+    return {
+        match.group(1): match.group(2)
+        for line in plan.splitlines()
+        if (match := SQLITE_SCAN.search(line.strip()))
+        and match.group(1) not in subqueries
+    }
+
+
+def find_sequential_scans(plan):
+    """Возвращает таблицы, которые читаются целиком, в виде словаря
+    {таблица: индекс}. Для полного прохода по индексу без условия
+    указывается индекс, для чтения самой таблицы — None."""
+    if connection.vendor == 'postgresql':
+        return _find_postgresql_scans(plan)
+    return _find_sqlite_scans(plan)
+
+
+class Command(BaseCommand):
+    help = ('Run EXPLAIN for the query shapes of RecipeViewSet, the feed '
+            'and UserViewSet and report full table and index scans')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='Id of the user to build the queries for, '
+                 'the first user by default',
+        )
+        parser.add_argument(
+            '--allow',
+            nargs='*',
+            default=('recipes_tag',),
+            help='Tables that are small enough to be scanned',
+        )
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Print the full plan of every query',
+        )
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Exit with an error if a full scan is found',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f'{connection.vendor} is not supported')
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(id=options['user'])
+        user = users.first()
+        recipe = Recipe.objects.first()
+        if user is None or recipe is None:
+            raise CommandError('The database has no users or recipes, '
+                               'generate a dataset first')
+        flagged = 0
+        for name, (sql, params) in self._get_query_shapes(user, recipe):
+            plan = self._explain(sql, params)
+            scans = {
+                table: index
+                for table, index in find_sequential_scans(plan).items()
+                if table not in options['allow']
+                and not (index and name in ORDERED_INDEX_SCANS)
+            }
+            if scans:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f'{name}: ' + ', '.join(
+                    table if index is None else f'{table} (index {index})'
+                    for table, index in sorted(scans.items())
+                )))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: OK'))
+            if options['verbose_plans'] or scans:
+                self.stdout.write(plan)
+        if flagged and options['strict']:
+            raise CommandError(f'{flagged} queries use full scans')
+
+    def _explain(self, sql, params):
+        """В PostgreSQL последовательное сканирование отключается, чтобы
+        на небольших данных отмечались только запросы без подходящего
+        индекса."""
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(
+                f'{connection.ops.explain_query_prefix()} {sql}', params
+            )
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def _get_view(self, viewset, user, action, **params):
+        request = Request(RequestFactory().get('/', params))
+        request.user = user
+        return viewset(request=request, action=action, format_kwarg=None,
+                       kwargs={})
+
+    def _get_view_queryset(self, viewset, user, action, **params):
+        view = self._get_view(viewset, user, action, **params)
+        return view.filter_queryset(view.get_queryset())
+
+    def _get_query_shapes(self, user, recipe):
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        recipes = {
+            'recipes: list': {},
+            'recipes: tags': {'tags': tags},
+            'recipes: author': {'author': recipe.author_id},
+            'recipes: favorites': {'is_favorited': 1},
+            'recipes: shopping cart': {'is_in_shopping_cart': 1},
+            'recipes: search': {'search': recipe.name.split()[0]},
+        }
+        for name, params in recipes.items():
+            queryset = self._get_view_queryset(RecipeViewSet, user, 'list',
+                                               **params)
+            yield name, queryset[:6].query.sql_with_params()
+        queryset = self._get_view_queryset(RecipeViewSet, user, 'list')
+        yield 'recipes: cursor page', queryset.order_by(
+            '-pub_date', '-id'
+        ).filter(pub_date__lt=recipe.pub_date)[:6].query.sql_with_params()
+        yield 'recipes: detail', queryset.filter(
+            pk=recipe.pk
+        ).query.sql_with_params()
+        queryset = self._get_view(RecipeViewSet, user,
+                                  'list')._get_values_queryset()
+        yield 'recipes: values list', queryset[:6].query.sql_with_params()
+        yield 'recipes: values detail', queryset.filter(
+            pk=recipe.pk
+        ).query.sql_with_params()
+        recipe_ids = [row['id'] for row in queryset[:6]]
+        yield 'recipes: values tags', RecipeValuesSerializer.get_tags_queryset(
+            recipe_ids
+        ).query.sql_with_params()
+        yield ('recipes: values ingredients',
+               RecipeValuesSerializer.get_ingredients_queryset(
+                   recipe_ids
+               ).query.sql_with_params())
+        yield ('recipes: values authors',
+               RecipeValuesSerializer.get_authors_queryset(
+                   {row['author_id'] for row in queryset[:6]}
+               ).query.sql_with_params())
+        queryset = TimelineEntry.objects.filter(user=user).values(
+            'recipe_id', 'pub_date'
+        ).order_by(*RecipeCursorPaginator.ordering)
+        yield 'feed: timeline page', queryset[:6].query.sql_with_params()
+        yield 'feed: timeline cursor page', queryset.filter(
+            pub_date__lt=recipe.pub_date
+        )[:6].query.sql_with_params()
+        yield 'recipes: shopping list', ShoppingListItem.objects.filter(
+            user=user
+        ).values(
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        ).order_by('ingredient__name').query.sql_with_params()
+        queryset = self._get_view_queryset(UserViewSet, user, 'list')
+        yield 'users: list', queryset[:6].query.sql_with_params()
+        queryset = self._get_view_queryset(UserViewSet, user,
+                                           'subscriptions')
+        yield 'users: subscriptions', queryset[:6].query.sql_with_params()
+        yield 'users: followed authors', user.follower.values_list(
+            'author_id', flat=True
+        ).query.sql_with_params()
+        author_ids = list(queryset.values_list('id', flat=True)[:6])
+        recipes = Recipe.objects.limit_per_author(author_ids or [0], 3)
+        yield 'users: subscription recipes', (recipes.raw_query,
+                                              recipes.params)
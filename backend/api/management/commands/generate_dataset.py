@@ -0,0 +1,261 @@
+import random
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.db.transaction import atomic
+from PIL import Image
+from tqdm import tqdm
+
+from core.constants import DatasetConstants
+from recipes.models import (Favorite,
+                            Ingredient,
+                            Recipe,
+                            RecipeIngredient,
+                            ShoppingCart,
+                            Tag,
+                            TagRecipe)
+from users.models import Subscription, User
+
+PUBLICATION_START = datetime(2023, 1, 1, tzinfo=timezone.utc)
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей',
+               'Елена', 'Дмитрий', 'Наталья', 'Алексей')
+LAST_NAMES = ('Иванова', 'Смирнов', 'Кузнецова', 'Попов', 'Васильева',
+              'Петров', 'Соколова', 'Михайлов', 'Новикова', 'Фёдоров')
+DISHES = ('Суп', 'Салат', 'Пирог', 'Омлет', 'Плов', 'Рагу', 'Борщ',
+          'Гуляш', 'Паштет', 'Десерт')
+STYLES = ('по-домашнему', 'с грибами', 'с курицей', 'с овощами',
+          'по-итальянски', 'на скорую руку', 'с сыром', 'с зеленью')
+STEPS = ('Подготовьте и вымойте все ингредиенты.',
+         'Нарежьте овощи небольшими кубиками.',
+         'Разогрейте сковороду с маслом.',
+         'Доведите до кипения и убавьте огонь.',
+         'Посолите и поперчите по вкусу.',
+         'Запекайте до золотистой корочки.',
+         'Дайте настояться перед подачей.')
+
+
+class Command(BaseCommand):
+    help = ('Generate a deterministic synthetic dataset of users, recipes, '
+            'subscriptions, favorites, shopping carts and feeds '
+            'for load testing')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=0.01,
+            help=f'Scale factor, 1 means {DatasetConstants.USERS} users '
+                 f'and {DatasetConstants.RECIPES} recipes',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed of the random generator',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of rows inserted per query',
+        )
+        parser.add_argument(
+            '--password',
+            default='dataset-password',
+            help='Password of every generated user',
+        )
+
+    def handle(self, *args, **options):
+        if not Tag.objects.exists() or not Ingredient.objects.exists():
+            raise CommandError('Load tags and ingredients first with '
+                               'upload_tags and upload_ingredients')
+        if User.objects.filter(
+            username__startswith=DatasetConstants.USERNAME_PREFIX
+        ).exists():
+            raise CommandError('The database already contains '
+                               'a generated dataset')
+        scale = options['scale']
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        user_ids = self._create_users(
+            max(int(DatasetConstants.USERS * scale), 2),
+            options['password']
+        )
+        author_ids = user_ids[
+            :max(int(len(user_ids) * DatasetConstants.AUTHORS_SHARE), 1)
+        ]
+        recipe_ids = self._create_recipes(
+            max(int(DatasetConstants.RECIPES * scale), 1), author_ids
+        )
+        self._create_relations(Subscription, 'author', user_ids, author_ids,
+                               DatasetConstants.SUBSCRIPTIONS_PER_USER,
+                               exclude_self=True)
+        self._create_relations(Favorite, 'recipe', user_ids, recipe_ids,
+                               DatasetConstants.FAVORITES_PER_USER)
+        self._create_relations(ShoppingCart, 'recipe', user_ids, recipe_ids,
+                               DatasetConstants.SHOPPING_CART_PER_USER)
+        call_command('rebuild_shopping_lists', batch_size=self.batch_size,
+                     stdout=self.stdout)
+        call_command('reconcile_counters', batch_size=self.batch_size,
+                     stdout=self.stdout)
+        call_command('rebuild_timelines', batch_size=self.batch_size,
+                     stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Dataset was generated: {len(user_ids)} users, '
+            f'{len(recipe_ids)} recipes'
+        ))
+
+    def _batches(self, items, description):
+        items = iter(tqdm(items, desc=description, colour='green'))
+        while batch := list(islice(items, self.batch_size)):
+            yield batch
+
+    def _choice(self, population):
+        """Элементы из начала последовательности выбираются чаще:
+        так получаются популярные авторы и рецепты."""
+        return population[int(
+            len(population)
+            * self.rng.random() ** DatasetConstants.POPULARITY_SKEW
+        )]
+
+    def _sample(self, population, count, exclude=None):
+        count = min(count, len(population) // 2)
+        picked = set()
+        while len(picked) < count:
+            item = self._choice(population)
+            if item != exclude:
+                picked.add(item)
+        return sorted(picked)
+
+    def _create_users(self, count, password):
+        password = make_password(password)
+        prefix = DatasetConstants.USERNAME_PREFIX
+        with atomic():
+            for batch in self._batches(range(count), 'users'):
+                User.objects.bulk_create(
+                    User(username=f'{prefix}{number}',
+                         email=f'{prefix}{number}'
+                               f'@{DatasetConstants.EMAIL_DOMAIN}',
+                         first_name=self.rng.choice(FIRST_NAMES),
+                         last_name=self.rng.choice(LAST_NAMES),
+                         password=password)
+                    for number in batch
+                )
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('id').values_list('id', flat=True))
+
+    def _create_images(self):
+        """Сохраняет несколько крошечных изображений, которые
+        используются всеми сгенерированными рецептами."""
+        names = []
+        for number in range(DatasetConstants.PLACEHOLDER_IMAGES):
+            name = f'recipes/dataset_{number}.png'
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            if not default_storage.exists(name):
+                buffer = BytesIO()
+                Image.new(
+                    'RGB', DatasetConstants.PLACEHOLDER_IMAGE_SIZE, color
+                ).save(buffer, 'PNG')
+                default_storage.save(name, ContentFile(buffer.getvalue()))
+            names.append(name)
+        return names
+
+    def _create_recipes(self, count, author_ids):
+        """Рецепты создаются пачками, каждая в своей транзакции вместе
+        с тэгами и ингредиентами. Даты публикации равномерно
+        распределяются по PUBLICATION_PERIOD_DAYS."""
+        images = self._create_images()
+        tag_ids = list(Tag.objects.order_by('id').values_list(
+            'id', flat=True
+        ))
+        ingredient_ids = list(Ingredient.objects.order_by('id').values_list(
+            'id', flat=True
+        ))
+        step = timedelta(days=DatasetConstants.PUBLICATION_PERIOD_DAYS)
+        step /= count
+        recipe_ids = []
+        for batch in self._batches(range(count), 'recipes'):
+            with atomic():
+                last_id = Recipe.objects.aggregate(
+                    last_id=Max('id')
+                )['last_id'] or 0
+                Recipe.objects.bulk_create(
+                    self._make_recipe(author_ids, images) for _ in batch
+                )
+                recipes = list(Recipe.objects.filter(
+                    id__gt=last_id
+                ).order_by('id').only('id'))
+                for recipe, number in zip(recipes, batch):
+                    recipe.pub_date = PUBLICATION_START + step * number
+                Recipe.objects.bulk_update(recipes, ('pub_date',),
+                                           batch_size=self.batch_size)
+                TagRecipe.objects.bulk_create(
+                    self._make_tag_links(recipes, tag_ids),
+                    batch_size=self.batch_size
+                )
+                RecipeIngredient.objects.bulk_create(
+                    self._make_recipe_ingredients(recipes, ingredient_ids),
+                    batch_size=self.batch_size
+                )
+            recipe_ids.extend(recipe.id for recipe in recipes)
+        return recipe_ids
+
+    def _make_recipe(self, author_ids, images):
+        return Recipe(
+            author_id=self._choice(author_ids),
+            name=f'{self.rng.choice(DISHES)} {self.rng.choice(STYLES)}',
+            text=' '.join(self.rng.sample(STEPS, 3)),
+            cooking_time=self.rng.randint(*DatasetConstants.COOKING_TIME),
+            image=self.rng.choice(images),
+        )
+
+    def _make_tag_links(self, recipes, tag_ids):
+        for recipe in recipes:
+            count = self.rng.randint(*DatasetConstants.TAGS_PER_RECIPE)
+            for tag_id in self.rng.sample(tag_ids,
+                                          min(count, len(tag_ids))):
+                yield TagRecipe(recipe_id=recipe.id, tag_id=tag_id)
+
+    def _make_recipe_ingredients(self, recipes, ingredient_ids):
+        for recipe in recipes:
+            count = self.rng.randint(
+                *DatasetConstants.INGREDIENTS_PER_RECIPE
+            )
+            for ingredient_id in self.rng.sample(
+                ingredient_ids, min(count, len(ingredient_ids))
+            ):
+                yield RecipeIngredient(
+                    recipe_id=recipe.id,
+                    ingredient_id=ingredient_id,
+                    amount=self.rng.randint(*DatasetConstants.AMOUNT)
+                )
+
+    def _create_relations(self, model, field, user_ids, targets, average,
+                          exclude_self=False):
+        """Связывает каждого пользователя в среднем с average объектами,
+        популярные объекты выбираются чаще."""
+        with atomic():
+            for batch in self._batches(user_ids,
+                                       model._meta.verbose_name_plural):
+                model.objects.bulk_create(
+                    self._make_relations(model, field, batch, targets,
+                                         average, exclude_self),
+                    batch_size=self.batch_size
+                )
+
+    def _make_relations(self, model, field, user_ids, targets, average,
+                        exclude_self):
+        for user_id in user_ids:
+            for target in self._sample(
+                targets, self.rng.randint(0, 2 * average),
+                exclude=user_id if exclude_self else None
+            ):
+                yield model(user_id=user_id, **{f'{field}_id': target})
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+
+from core.images import has_actual_variants, make_image_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Generate resized image variants for existing recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate variants that are already up to date',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').only(
+            'image', 'image_thumbnail', 'image_medium'
+        )
+        generated = failed = 0
+        for recipe in tqdm(recipes.iterator(), total=recipes.count(),
+                           colour='green'):
+            if not options['force'] and has_actual_variants(recipe):
+                continue
+            try:
+                make_image_variants(recipe.id)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'Recipe {recipe.id}: {error}')
+            else:
+                generated += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Image variants were generated for {generated} recipes, '
+            f'{failed} failed'
+        ))
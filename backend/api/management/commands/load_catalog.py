@@ -0,0 +1,116 @@
+import csv
+import json
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from tqdm import tqdm
+
+from core.cache import bump_data_version
+from core.constants import CacheConstants
+from recipes.models import Ingredient, Tag
+
+CATALOGS = {
+    'ingredients': (Ingredient, ('name', 'measurement_unit'),
+                    CacheConstants.INGREDIENTS_NAMESPACE),
+    'tags': (Tag, ('name', 'color', 'slug'),
+             CacheConstants.TAGS_NAMESPACE),
+}
+FORMATS = {
+    '.json': 'json',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.csv': 'csv',
+}
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(file):
+    """Читает элементы JSON-массива по одному, не загружая весь файл
+    в память."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON file must contain an array of objects')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(','):
+            buffer = buffer[1:].lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            record, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError as error:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                raise CommandError(f'Invalid JSON: {error}')
+            buffer += chunk
+            continue
+        yield record
+        buffer = buffer[end:]
+
+
+def iter_ndjson(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+READERS = {
+    'json': iter_json_array,
+    'ndjson': iter_ndjson,
+    'csv': csv.DictReader,
+}
+
+
+class Command(BaseCommand):
+    help = 'Import ingredients or tags from a JSON, NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('catalog', choices=CATALOGS)
+        parser.add_argument('path', type=Path)
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='File format, detected by the file extension by default',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows inserted per query',
+        )
+
+    def handle(self, *args, **options):
+        model, fields, cache_namespace = CATALOGS[options['catalog']]
+        path = options['path']
+        file_format = options['format'] or FORMATS.get(path.suffix.lower())
+        if file_format is None:
+            raise CommandError(f'Unknown format of file "{path}", '
+                               f'use --format')
+        rows_before = model.objects.count()
+        total = invalid = 0
+        try:
+            with open(path, encoding='utf-8', newline='') as file:
+                records = tqdm(READERS[file_format](file), colour='green')
+                while batch := list(islice(records, options['batch_size'])):
+                    objects = [
+                        model(**{field: record[field] for field in fields})
+                        for record in batch
+                        if all(record.get(field) for field in fields)
+                    ]
+                    total += len(batch)
+                    invalid += len(batch) - len(objects)
+                    model.objects.bulk_create(objects,
+                                              ignore_conflicts=True)
+        except FileNotFoundError:
+            raise CommandError(f'File "{path}" not found')
+        finally:
+            bump_data_version(cache_namespace)
+        inserted = model.objects.count() - rows_before
+        self.stdout.write(self.style.SUCCESS(
+            f'Data was successfully imported: {inserted} inserted, '
+            f'{total - inserted - invalid} already existed, '
+            f'{invalid} invalid'
+        ))
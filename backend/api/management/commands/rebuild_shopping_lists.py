@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.transaction import atomic
+
+from core.services import get_shopping_list_totals
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or validate shopping list totals from shopping carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report differences without changing the data',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows inserted per query',
+        )
+
+    def handle(self, *args, **options):
+        expected = {
+            (row['recipe__shoppingcarts__user'], row['ingredient']):
+                row['total']
+            for row in get_shopping_list_totals().iterator()
+        }
+        if options['check']:
+            return self._check(expected)
+        with atomic():
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.bulk_create(
+                (ShoppingListItem(user_id=user_id,
+                                  ingredient_id=ingredient_id,
+                                  amount=amount)
+                 for (user_id, ingredient_id), amount in expected.items()),
+                batch_size=options['batch_size'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Shopping lists were rebuilt: {len(expected)} rows'))
+
+    def _check(self, expected):
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            ).iterator()
+        }
+        mismatched = {
+            key for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)
+        }
+        if mismatched:
+            raise CommandError(
+                f'Shopping lists differ from carts in {len(mismatched)} rows,'
+                f' run the command without --check to rebuild them'
+            )
+        self.stdout.write(self.style.SUCCESS('Shopping lists are up to date'))
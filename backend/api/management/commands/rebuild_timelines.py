@@ -0,0 +1,50 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db.transaction import atomic
+
+from core.constants import FeedConstants
+from core.services import get_recipes_by_author
+from recipes.models import TimelineEntry
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+    help = ('Rebuild subscription feeds from the latest recipes of the '
+            'followed authors')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of authors processed and rows inserted per query',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        author_ids = list(Subscription.objects.order_by(
+            'author_id'
+        ).values_list('author_id', flat=True).distinct())
+        created = 0
+        with atomic():
+            TimelineEntry.objects.all().delete()
+            for start in range(0, len(author_ids), batch_size):
+                recipes_by_author = get_recipes_by_author(
+                    author_ids[start:start + batch_size],
+                    FeedConstants.BACKFILL_SIZE
+                )
+                entries = (
+                    TimelineEntry(user_id=user_id, recipe_id=recipe.id,
+                                  author_id=author_id,
+                                  pub_date=recipe.pub_date)
+                    for user_id, author_id in Subscription.objects.filter(
+                        author_id__in=recipes_by_author
+                    ).values_list('user_id', 'author_id').iterator()
+                    for recipe in recipes_by_author[author_id]
+                )
+                while batch := list(islice(entries, batch_size)):
+                    TimelineEntry.objects.bulk_create(batch)
+                    created += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Timelines were rebuilt: {created} rows'))
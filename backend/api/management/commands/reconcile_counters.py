@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from core.services import COUNTERS, count_related
+
+
+class Command(BaseCommand):
+    help = ('Recalculate denormalized counters of recipes and users that '
+            'differ from the related rows')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report drifted counters without changing the data',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows updated per query',
+        )
+
+    def handle(self, *args, **options):
+        drifted_total = 0
+        for model, field, related_model, related_field in COUNTERS:
+            actual = count_related(related_model, related_field)
+            drifted = list(model.objects.annotate(
+                actual=actual
+            ).exclude(**{field: F('actual')}).values_list('pk', flat=True))
+            drifted_total += len(drifted)
+            if drifted:
+                self.stdout.write(
+                    f'{model.__name__}.{field}: {len(drifted)} rows differ')
+            if options['check']:
+                continue
+            for start in range(0, len(drifted), options['batch_size']):
+                model.objects.filter(
+                    pk__in=drifted[start:start + options['batch_size']]
+                ).update(**{field: actual})
+        if not options['check']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Counters were reconciled: {drifted_total} rows fixed'))
+        elif drifted_total:
+            raise CommandError(
+                f'{drifted_total} counters differ from the related rows, '
+                f'run the command without --check to fix them'
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS('Counters are up to date'))
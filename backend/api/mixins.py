@@ -0,0 +1,61 @@
+from hashlib import md5, sha1
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+
+from core.cache import get_data_version
+
+
+class VersionedCacheMixin:
+    """Кеширует отрендеренные JSON-ответы list и retrieve.
+
+    Ключ кеша включает версию данных `cache_namespace`, поэтому
+    любое изменение данных делает недействительными все ответы
+    сразу. Ответы отдаются с сильным ETag, а на совпадающий
+    If-None-Match возвращается 304 без обращения к базе данных
+    и сериализаторам."""
+
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        return self._get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def _get_cache_key(self, request):
+        request_key = md5(
+            f'{request.accepted_media_type}:{request.get_full_path()}'
+            .encode()
+        ).hexdigest()
+        version = get_data_version(self.cache_namespace)
+        return f'response:{self.cache_namespace}:{version}:{request_key}'
+
+    def _get_cached_response(self, handler, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+        key = self._get_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            response = self.finalize_response(
+                request, handler(request, *args, **kwargs), *args, **kwargs
+            )
+            if response.status_code != 200:
+                return response
+            response.render()
+            cached = (
+                f'"{sha1(response.content).hexdigest()}"',
+                response['Content-Type'],
+                response.content,
+            )
+            cache.set(key, cached)
+        etag, content_type, content = cached
+        response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        return get_conditional_response(request, etag=etag,
+                                        response=response)
@@ -1,6 +1,61 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class PageNumberPaginator(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+
+
+class RecipeCursorPaginator(CursorPagination):
+    """Курсорная пагинация ленты рецептов без COUNT(*) и OFFSET."""
+
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = PageNumberPaginator.page_size_query_param
+    page_size = PageNumberPaginator.page_size
+
+
+class RecipePaginator(PageNumberPaginator):
+    """Постраничная пагинация, которая переключается на курсорную,
+    если в запросе передан `pagination=cursor` или сам курсор.
+
+    Курсор всегда упорядочивает рецепты по дате публикации, поэтому
+    вместе с параметрами из `ranked_query_params`, которые сортируют
+    выдачу по релевантности, курсорная пагинация не принимается."""
+
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    ranked_query_params = ('search',)
+
+    def _use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param)
+            == self.cursor_mode
+            or RecipeCursorPaginator.cursor_query_param
+            in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self._use_cursor(request):
+            if any(request.query_params.get(param)
+                   for param in self.ranked_query_params):
+                raise ValidationError({self.mode_query_param: (
+                    'Курсорная пагинация недоступна при поиске: '
+                    'результаты поиска сортируются по релевантности.'
+                )})
+            self.cursor_paginator = RecipeCursorPaginator()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
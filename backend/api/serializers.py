@@ -1,22 +1,30 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.db.transaction import atomic
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import (CharField,
                                    IntegerField,
-                                   ReadOnlyField,
                                    BooleanField)
-from rest_framework.relations import PrimaryKeyRelatedField
 from rest_framework.serializers import ModelSerializer, SerializerMethodField
 from rest_framework.validators import UniqueTogetherValidator
 
+from api.fields import (BulkListSerializer,
+                        BulkPrimaryKeyRelatedField,
+                        ImageVariantField)
+from core.cache import get_recipe_body_keys
 from core.constants import RecipeConstants
-from core.services import pass_ingredients
+from core.services import (get_recipes_by_author,
+                           pass_ingredients,
+                           update_carted_shopping_lists,
+                           update_recipe_ingredients)
 from recipes.models import (
     Ingredient,
     Favorite,
     Recipe,
     RecipeIngredient,
     Tag,
+    TagRecipe,
     ShoppingCart
 )
 from users.models import Subscription, User
@@ -35,10 +43,13 @@ class UserGetSerializer(ModelSerializer):
 
     def _is_subscribed(self, obj):
         request = self.context.get('request')
-
-        return (request
-                and request.user.is_authenticated
-                and request.user.follower.filter(author=obj).exists())
+        if not (request and request.user.is_authenticated):
+            return False
+        if 'following' not in self.context:
+            self.context['following'] = set(
+                request.user.follower.values_list('author_id', flat=True)
+            )
+        return obj.id in self.context['following']
 
 
 class IngredientSerializer(ModelSerializer):
@@ -76,7 +87,7 @@ class IngredientGetSerializer(ModelSerializer):
 class IngredientPostSerializer(ModelSerializer):
     """ Сериализатор для работы с ингредиентами в POST-запросах."""
 
-    id = PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = BulkPrimaryKeyRelatedField(queryset=Ingredient.objects.all())
     amount = IntegerField(
         min_value=RecipeConstants.MIN_VALUE,
         max_value=RecipeConstants.MAXIMUM_AMOUNT_ALLOWED,
@@ -91,12 +102,15 @@ class IngredientPostSerializer(ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'amount')
+        list_serializer_class = BulkListSerializer
 
 
 class RecipeGetSerializer(ModelSerializer):
     """ Сериализатор для работы с рецептами в GET-запросах."""
 
     image = Base64ImageField(required=True)
+    image_thumbnail = ImageVariantField()
+    image_medium = ImageVariantField()
     tags = TagSerializer(many=True, read_only=True)
     author = UserGetSerializer()
     is_in_shopping_cart = BooleanField(default=0)
@@ -108,15 +122,188 @@ class RecipeGetSerializer(ModelSerializer):
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_in_shopping_cart', 'is_favorited',
-                  'name', 'image', 'text', 'cooking_time')
+                  'name', 'image', 'image_thumbnail', 'image_medium',
+                  'text', 'cooking_time')
+
+
+class RecipeValuesSerializer:
+    """ Быстрый сериализатор рецептов для GET-запросов.
+
+    Работает со строками values() вместо объектов моделей и выдаёт то же,
+    что RecipeGetSerializer. Не зависящая от пользователя часть ответа
+    берётся из кеша, а для рецептов, которых там нет, тэги, ингредиенты
+    и авторы загружаются тремя запросами. Отметки избранного и корзины
+    приходят вместе со строками рецептов, подписки пользователя
+    загружаются ещё одним запросом."""
+
+    values_fields = ('id', 'name', 'image', 'image_thumbnail',
+                     'image_medium', 'text', 'cooking_time', 'author_id',
+                     'pub_date', 'version')
+    annotated_fields = ('is_in_shopping_cart', 'is_favorited')
+    image_fields = ('image', 'image_thumbnail', 'image_medium')
+
+    def __init__(self, instance, many=False, context=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @classmethod
+    def get_values(cls, queryset):
+        """Строки рецептов с полями, нужными сериализатору."""
+        return queryset.values(*cls.values_fields, *(
+            name for name in cls.annotated_fields
+            if name in queryset.query.annotations
+        ))
+
+    @property
+    def data(self):
+        rows = list(self.instance) if self.many else [self.instance]
+        bodies = self._get_bodies(rows)
+        following = self._get_following()
+        data = [self._to_representation(bodies[row['id']], row, following)
+                for row in rows]
+        return data if self.many else data[0]
+
+    def _to_representation(self, body, row, following):
+        return {
+            **body,
+            'author': {
+                **body['author'],
+                'is_subscribed': row['author_id'] in following,
+            },
+            'is_in_shopping_cart': bool(
+                row.get('is_in_shopping_cart', False)
+            ),
+            'is_favorited': bool(row.get('is_favorited', False)),
+            **{field_name: self._get_absolute_url(body[field_name])
+               for field_name in self.image_fields},
+        }
+
+    def _get_absolute_url(self, url):
+        request = self.context.get('request')
+        if url is None or request is None:
+            return url
+        return request.build_absolute_uri(url)
+
+    def _get_bodies(self, rows):
+        """Общие для всех пользователей части ответа по id рецептов."""
+        keys = get_recipe_body_keys(rows)
+        cached = cache.get_many(keys.values())
+        bodies = {recipe_id: cached[key] for recipe_id, key in keys.items()
+                  if key in cached}
+        missing = [row for row in rows if row['id'] not in bodies]
+        if missing:
+            built = self._build_bodies(missing)
+            cache.set_many(
+                {keys[recipe_id]: body for recipe_id, body in built.items()},
+                settings.RECIPE_CACHE_TIMEOUT
+            )
+            bodies.update(built)
+        return bodies
+
+    def _build_bodies(self, rows):
+        """Отметки пользователя заполняются значениями по умолчанию,
+        чтобы порядок ключей совпадал с RecipeGetSerializer."""
+        recipe_ids = [row['id'] for row in rows]
+        tags = self._get_tags(recipe_ids)
+        ingredients = self._get_ingredients(recipe_ids)
+        authors = self._get_authors({row['author_id'] for row in rows})
+        return {
+            row['id']: {
+                'id': row['id'],
+                'tags': tags.get(row['id'], []),
+                'author': authors[row['author_id']],
+                'ingredients': ingredients.get(row['id'], []),
+                'is_in_shopping_cart': False,
+                'is_favorited': False,
+                'name': row['name'],
+                'image': self._get_image_url('image', row['image']),
+                'image_thumbnail': self._get_image_url(
+                    'image_thumbnail', row['image_thumbnail'] or row['image']
+                ),
+                'image_medium': self._get_image_url(
+                    'image_medium', row['image_medium'] or row['image']
+                ),
+                'text': row['text'],
+                'cooking_time': row['cooking_time'],
+            }
+            for row in rows
+        }
+
+    @staticmethod
+    def _get_image_url(field_name, name):
+        if not name:
+            return None
+        return Recipe._meta.get_field(field_name).storage.url(name)
+
+    @staticmethod
+    def get_tags_queryset(recipe_ids):
+        return TagRecipe.objects.filter(recipe_id__in=recipe_ids).values(
+            'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'
+        ).order_by('tag_id')
+
+    @classmethod
+    def _get_tags(cls, recipe_ids):
+        tags = {}
+        for row in cls.get_tags_queryset(recipe_ids):
+            tags.setdefault(row['recipe_id'], []).append({
+                'id': row['tag_id'],
+                'name': row['tag__name'],
+                'color': row['tag__color'],
+                'slug': row['tag__slug'],
+            })
+        return tags
+
+    @staticmethod
+    def get_ingredients_queryset(recipe_ids):
+        return RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'
+        ).order_by('id')
+
+    @classmethod
+    def _get_ingredients(cls, recipe_ids):
+        ingredients = {}
+        for row in cls.get_ingredients_queryset(recipe_ids):
+            ingredients.setdefault(row['recipe_id'], []).append({
+                'id': row['ingredient_id'],
+                'name': row['ingredient__name'],
+                'measurement_unit': row['ingredient__measurement_unit'],
+                'amount': row['amount'],
+            })
+        return ingredients
+
+    @staticmethod
+    def get_authors_queryset(author_ids):
+        return User.objects.filter(id__in=author_ids).values(
+            'id', 'email', 'username', 'first_name', 'last_name'
+        )
+
+    @classmethod
+    def _get_authors(cls, author_ids):
+        return {row['id']: {**row, 'is_subscribed': False}
+                for row in cls.get_authors_queryset(author_ids)}
+
+    def _get_following(self):
+        """Те же подписки, что использует UserGetSerializer."""
+        request = self.context.get('request')
+        if not (request and request.user.is_authenticated):
+            return set()
+        if 'following' not in self.context:
+            self.context['following'] = set(
+                request.user.follower.values_list('author_id', flat=True)
+            )
+        return self.context['following']
 
 
 class RecipePostSerializer(ModelSerializer):
     """ Сериализатор для работы с рецептами в POST-запросах."""
 
     ingredients = IngredientPostSerializer(many=True)
-    tags = PrimaryKeyRelatedField(many=True,
-                                  queryset=Tag.objects.all())
+    tags = BulkPrimaryKeyRelatedField(many=True,
+                                      queryset=Tag.objects.all())
     image = Base64ImageField(required=True)
     cooking_time = IntegerField(
         min_value=RecipeConstants.MIN_VALUE,
@@ -176,15 +363,21 @@ class RecipePostSerializer(ModelSerializer):
 
     @atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        instance.tags.clear()
-        instance.tags.set(tags)
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        pass_ingredients(ingredients, instance)
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            update_carted_shopping_lists(
+                instance.id,
+                *update_recipe_ingredients(ingredients, instance)
+            )
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        instance = Recipe.objects.with_related().get_recipe_filters(
+            self.context.get('request').user
+        ).get(pk=instance.pk)
         return RecipeGetSerializer(instance,
                                    context=self.context).data
 
@@ -228,16 +421,19 @@ class RecipeMinifiedSerializer(ModelSerializer):
     """ Уменьшенная версия сериализатора списка рецептов.
     Используется при взаимодействии со списком покупок."""
 
+    image_thumbnail = ImageVariantField()
+    image_medium = ImageVariantField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumbnail', 'image_medium',
+                  'cooking_time')
 
 
 class SubscriptionsListSerializer(UserGetSerializer):
     """Сериализатор для работы со списком подписок."""
 
     recipes = SerializerMethodField(method_name='_recipes')
-    recipes_count = ReadOnlyField(source='recipes.count')
 
     class Meta:
         model = User
@@ -253,18 +449,26 @@ class SubscriptionsListSerializer(UserGetSerializer):
         )
         read_only_fields = ('__all__',)
 
-    def _recipes(self, obj):
+    def _recipes_limit(self):
         request = self.context.get('request')
-        recipes_limit = None
         if request:
-            recipes_limit = request.query_params.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if recipes_limit:
             try:
-                recipes = recipes[:int(recipes_limit)]
-            except ValueError:
+                return int(request.query_params.get('recipes_limit'))
+            except (TypeError, ValueError):
                 pass
-        return RecipeMinifiedSerializer(recipes, many=True,
+        return None
+
+    def _recipes(self, obj):
+        """Рецепты всех авторов страницы загружаются одним запросом
+        при сериализации первого из них."""
+        recipes_by_author = self.context.setdefault('author_recipes', {})
+        if obj.id not in recipes_by_author:
+            authors = (self.parent.instance
+                       if self.parent is not None else (obj,))
+            recipes_by_author.update(get_recipes_by_author(
+                [author.id for author in authors], self._recipes_limit()
+            ))
+        return RecipeMinifiedSerializer(recipes_by_author[obj.id], many=True,
                                         context=self.context).data
 
 
@@ -0,0 +1,326 @@
+import shutil
+import tempfile
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.fields import BulkPrimaryKeyRelatedField
+from api.serializers import RecipeGetSerializer
+from core.constants import RecipeConstants
+from recipes.models import (Favorite,
+                            Ingredient,
+                            Recipe,
+                            RecipeIngredient,
+                            ShoppingCart,
+                            Tag,
+                            TagRecipe)
+from users.models import Subscription, User
+
+
+class RecipeTestCase(TestCase):
+    """Пользователи, тэги и ингредиенты для тестов API рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [Tag.objects.create(name=f'Тэг {index}',
+                                       color=f'#00000{index}',
+                                       slug=f'tag-{index}')
+                    for index in range(6)]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {index}',
+                                      measurement_unit='г')
+            for index in range(40)
+        ]
+        cls.user = cls.create_user('user')
+        cls.authors = [cls.create_user(f'author{index}')
+                       for index in range(4)]
+
+    @staticmethod
+    def create_user(username):
+        return User.objects.create_user(
+            email=f'{username}@example.com', username=username,
+            first_name='Имя', last_name='Фамилия', password='password'
+        )
+
+    @classmethod
+    def create_recipe(cls, author, ingredients=3, tags=2, name='Рецепт'):
+        recipe = Recipe.objects.create(
+            author=author, name=name, text='Описание рецепта',
+            cooking_time=5, image='recipes/image.png'
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+            for ingredient in cls.ingredients[:ingredients]
+        )
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag=tag) for tag in cls.tags[:tags]
+        )
+        return recipe
+
+    def setUp(self):
+        cache.clear()
+        self.client = self.get_client(self.user)
+
+    @staticmethod
+    def get_client(user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+
+class RecipeValuesSerializerTest(RecipeTestCase):
+    """Список и карточка рецепта из строк values() совпадают
+    с ответами RecipeGetSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.recipes = [
+            cls.create_recipe(cls.authors[index % 4],
+                              ingredients=1 + index % 5,
+                              tags=1 + index % 6,
+                              name=f'Рецепт {index}')
+            for index in range(9)
+        ]
+        RecipeIngredient.objects.create(recipe=cls.recipes[0],
+                                        ingredient=cls.ingredients[30],
+                                        amount=3)
+        RecipeIngredient.objects.create(recipe=cls.recipes[0],
+                                        ingredient=cls.ingredients[20],
+                                        amount=4)
+        TagRecipe.objects.filter(recipe=cls.recipes[2]).delete()
+        TagRecipe.objects.create(recipe=cls.recipes[2], tag=cls.tags[5])
+        TagRecipe.objects.create(recipe=cls.recipes[2], tag=cls.tags[1])
+        Recipe.objects.filter(pk=cls.recipes[3].pk).update(
+            image_thumbnail='recipes/variants/image_thumbnail.webp'
+        )
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[1])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[2])
+        Favorite.objects.create(user=cls.authors[1], recipe=cls.recipes[4])
+        ShoppingCart.objects.create(user=cls.authors[1],
+                                    recipe=cls.recipes[5])
+        Subscription.objects.create(user=cls.user, author=cls.authors[1])
+
+    def get_users(self):
+        return ((self.user, self.client),
+                (self.authors[1], self.get_client(self.authors[1])),
+                (AnonymousUser(), self.get_client()))
+
+    def get_expected(self, user, ids):
+        queryset = Recipe.objects.with_related()
+        if user.is_authenticated:
+            queryset = queryset.get_recipe_filters(user)
+        recipes = queryset.in_bulk(ids)
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        return JSONRenderer().render(RecipeGetSerializer(
+            [recipes[pk] for pk in ids], many=True,
+            context={'request': request}
+        ).data)
+
+    def assert_page_matches(self, user, response):
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertTrue(results)
+        self.assertEqual(
+            JSONRenderer().render(results),
+            self.get_expected(user, [recipe['id'] for recipe in results])
+        )
+
+    def test_list_matches_model_serializer(self):
+        for user, client in self.get_users():
+            for params in ('limit=50', 'limit=3&page=2', 'tags=tag-5',
+                           f'author={self.authors[1].id}',
+                           'search=рецепт', 'is_favorited=1',
+                           'is_in_shopping_cart=1'):
+                with self.subTest(user=user, params=params):
+                    self.assert_page_matches(
+                        user, client.get(f'/api/recipes/?{params}')
+                    )
+
+    def test_cursor_pages_match_model_serializer(self):
+        for user, client in self.get_users():
+            with self.subTest(user=user):
+                response = client.get(
+                    '/api/recipes/?pagination=cursor&limit=4'
+                )
+                self.assert_page_matches(user, response)
+                self.assert_page_matches(
+                    user, client.get(response.json()['next'])
+                )
+
+    def test_cursor_pages_reject_search(self):
+        response = self.client.get(
+            '/api/recipes/?pagination=cursor&search=рецепт'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('pagination', response.json())
+
+    def test_retrieve_matches_model_serializer(self):
+        for user, client in self.get_users():
+            for recipe in self.recipes:
+                with self.subTest(user=user, recipe=recipe.id):
+                    response = client.get(f'/api/recipes/{recipe.id}/')
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response.content,
+                                     self.get_expected(user,
+                                                       [recipe.id])[1:-1])
+        self.assertEqual(self.client.get('/api/recipes/0/').status_code, 404)
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        # Версии справочников создаются в базе при первом чтении.
+        self.client.get('/api/recipes/')
+        for user, client, queries in ((self.user, self.client, 7),
+                                      (AnonymousUser(), self.get_client(), 6)):
+            for limit in (2, 9):
+                cache.clear()
+                with self.subTest(user=user, limit=limit):
+                    with self.assertNumQueries(queries):
+                        client.get(f'/api/recipes/?limit={limit}')
+
+
+class SubscriptionsListTest(RecipeTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.authors += [cls.create_user(f'author{index}')
+                        for index in range(4, 6)]
+        for author in cls.authors:
+            Subscription.objects.create(user=cls.user, author=author)
+            for index in range(3):
+                cls.create_recipe(author, name=f'Рецепт {index}')
+
+    def test_recipes_limit(self):
+        response = self.client.get(
+            '/api/users/subscriptions/?limit=10&recipes_limit=2'
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), len(self.authors))
+        for author in results:
+            self.assertEqual(len(author['recipes']), 2)
+            self.assertEqual(author['recipes_count'], 3)
+
+    def test_queries_do_not_depend_on_page_size(self):
+        for limit in (2, 6):
+            with self.subTest(limit=limit), self.assertNumQueries(4):
+                self.client.get(
+                    f'/api/users/subscriptions/?limit={limit}&recipes_limit=2'
+                )
+
+
+class IngredientSearchTest(RecipeTestCase):
+    """Поиск ингредиентов без `?limit=` ограничен
+    INGREDIENT_SEARCH_LIMIT, а совпадения по началу названия идут
+    перед совпадениями по подстроке."""
+
+    def get_names(self, params):
+        response = self.client.get(f'/api/ingredients/?{params}')
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.json()]
+
+    def test_default_limit(self):
+        limit = RecipeConstants.INGREDIENT_SEARCH_LIMIT
+        self.assertEqual(len(self.get_names('name=ингредиент')), limit)
+        self.assertEqual(len(self.get_names('name=ингредиент&limit=0')),
+                         limit)
+        self.assertEqual(len(self.get_names('name=ингредиент&limit=40')),
+                         40)
+
+    def test_prefix_matches_come_first(self):
+        Ingredient.objects.create(name='Сахар', measurement_unit='г')
+        Ingredient.objects.create(name='Ванильный сахар', measurement_unit='г')
+        Ingredient.objects.create(name='Тростниковый сахар',
+                                  measurement_unit='г')
+        self.assertEqual(self.get_names('name=сахар&limit=2'),
+                         ['Сахар', 'Ванильный сахар'])
+        self.assertEqual(self.get_names('name=сахар'),
+                         ['Сахар', 'Ванильный сахар', 'Тростниковый сахар'])
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAf'
+         'FcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BulkPrimaryKeyRelatedFieldTest(RecipeTestCase):
+    """Ингредиенты и тэги рецепта загружаются фиксированным числом
+    запросов, а ошибки совпадают с PrimaryKeyRelatedField."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def get_payload(self, ingredients, tags, amount=10):
+        return {
+            'ingredients': [{'id': ingredient.id, 'amount': amount}
+                            for ingredient in self.ingredients[:ingredients]],
+            'tags': [tag.id for tag in self.tags[:tags]],
+            'image': IMAGE,
+            'name': 'Рецепт',
+            'text': 'Описание рецепта',
+            'cooking_time': 5,
+        }
+
+    def test_queries_do_not_depend_on_ingredients_count(self):
+        for ingredients, tags in ((2, 1), (30, 6)):
+            with self.subTest(ingredients=ingredients):
+                with self.assertNumQueries(16):
+                    response = self.client.post(
+                        '/api/recipes/',
+                        self.get_payload(ingredients, tags),
+                        format='json'
+                    )
+                self.assertEqual(response.status_code, 201)
+                recipe = self.create_recipe(self.user, ingredients + 1)
+                with self.assertNumQueries(23):
+                    response = self.client.patch(
+                        f'/api/recipes/{recipe.id}/',
+                        self.get_payload(ingredients, tags, amount=20),
+                        format='json'
+                    )
+                self.assertEqual(response.status_code, 200)
+
+    def get_errors(self, field, value):
+        try:
+            field.run_validation([value])
+        except ValidationError as error:
+            return error.detail
+        return None
+
+    def test_errors_match_primary_key_related_field(self):
+        for value in (self.tags[0].id, str(self.tags[0].id), 0, 'abc',
+                      True, None, [self.tags[0].id], {'id': 1}):
+            with self.subTest(value=value):
+                self.assertEqual(
+                    self.get_errors(BulkPrimaryKeyRelatedField(
+                        many=True, queryset=Tag.objects.all()
+                    ), value),
+                    self.get_errors(PrimaryKeyRelatedField(
+                        many=True, queryset=Tag.objects.all()
+                    ), value)
+                )
+
+    def test_ingredient_errors_are_reported_per_item(self):
+        payload = self.get_payload(4, 1)
+        payload['ingredients'][1]['id'] = 0
+        payload['ingredients'][2]['id'] = 'abc'
+        response = self.client.post('/api/recipes/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        messages = PrimaryKeyRelatedField.default_error_messages
+        self.assertEqual(response.json()['ingredients'], [
+            {},
+            {'id': [messages['does_not_exist'].format(pk_value=0)]},
+            {'id': [messages['incorrect_type'].format(data_type='str')]},
+            {},
+        ])
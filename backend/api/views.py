@@ -1,35 +1,50 @@
-from django.db.models import Sum
+from contextlib import nullcontext
+
+from django.db.models import F
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
 from api.filters import IngredientFilter, RecipeFilter
+from api.mixins import VersionedCacheMixin
+from api.pagination import RecipeCursorPaginator, RecipePaginator
 from api.permissions import IsAuthorOrReadOnly
 from api.serializers import (IngredientSerializer,
                              TagSerializer,
                              RecipePostSerializer,
                              RecipeGetSerializer,
+                             RecipeValuesSerializer,
                              FavoriteSerializer,
                              ShoppingCartSerializer,
                              GetRemoveSubscriptionSerializer,
                              SubscriptionsListSerializer)
+from core.constants import CacheConstants, RecipeConstants
 from core.pdf_reporter import draw_pdf_report
-from core.services import _create_related_object, _delete_related_object
+from core.routers import read_from_replica
+from core.search import ingredient_index
+from core.services import (_create_related_object,
+                           _delete_related_object,
+                           pull_timeline,
+                           refreshing_shopping_lists)
 from recipes.models import (Ingredient,
                             Recipe,
                             Tag,
                             Favorite,
-                            ShoppingCart, RecipeIngredient)
+                            ShoppingCart,
+                            ShoppingListItem,
+                            TimelineEntry)
 from users.models import Subscription, User
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(VersionedCacheMixin, ReadOnlyModelViewSet):
     """ViewSet для работы с ингредиентами."""
 
+    cache_namespace = CacheConstants.INGREDIENTS_NAMESPACE
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
@@ -37,6 +52,26 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        """Поиск по названию обслуживается индексом в памяти процесса,
+        без обращения к базе данных и без `?limit=` возвращает не больше
+        INGREDIENT_SEARCH_LIMIT совпадений. Его ответы кешируются и
+        получают ETag так же, как полный список."""
+        if not request.query_params.get('name'):
+            return super().list(request, *args, **kwargs)
+        return self._get_cached_response(self._search, request,
+                                         *args, **kwargs)
+
+    def _search(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        try:
+            limit = int(request.query_params.get('limit'))
+        except (TypeError, ValueError):
+            limit = None
+        if limit is None or limit < 1:
+            limit = RecipeConstants.INGREDIENT_SEARCH_LIMIT
+        return Response(ingredient_index.search(name, limit))
+
 
 class RecipeViewSet(ModelViewSet):
     """ViewSet для работы с рецептами.
@@ -47,14 +82,10 @@ class RecipeViewSet(ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     permission_classes = (IsAuthorOrReadOnly,)
+    pagination_class = RecipePaginator
 
     def get_queryset(self):
-        queryset = Recipe.objects.select_related(
-            'author'
-        ).prefetch_related(
-            'tags',
-            'ingredients'
-        )
+        queryset = Recipe.objects.with_related()
         return (
             queryset.get_recipe_filters(self.request.user)
             if self.request.user.is_authenticated else queryset
@@ -65,6 +96,70 @@ class RecipeViewSet(ModelViewSet):
             return RecipeGetSerializer
         return RecipePostSerializer
 
+    def _get_values_queryset(self):
+        queryset = Recipe.objects.all()
+        if self.request.user.is_authenticated:
+            queryset = queryset.get_recipe_filters(self.request.user)
+        return RecipeValuesSerializer.get_values(
+            self.filter_queryset(queryset)
+        )
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов собирается из строк values() без создания
+        объектов моделей."""
+        queryset = self._get_values_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = RecipeValuesSerializer(
+                page, many=True, context=self.get_serializer_context()
+            )
+            return self.get_paginated_response(serializer.data)
+        serializer = RecipeValuesSerializer(
+            queryset, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        row = get_object_or_404(self._get_values_queryset(),
+                                pk=kwargs[self.lookup_field])
+        self.check_object_permissions(request, row)
+        return Response(RecipeValuesSerializer(
+            row, context=self.get_serializer_context()
+        ).data)
+
+    def perform_destroy(self, instance):
+        with refreshing_shopping_lists((instance.id,)):
+            instance.delete()
+
+    @action(methods=('get',), detail=False,
+            permission_classes=(IsAuthenticated,),
+            pagination_class=RecipeCursorPaginator)
+    def feed(self, request):
+        """Лента рецептов авторов, на которых подписан пользователь.
+
+        Страница читается из записей ленты пользователя по курсору,
+        без перебора рецептов всех его авторов."""
+        # Только что добавленные записи могут ещё не дойти до реплики.
+        with (read_from_replica(False) if pull_timeline(request.user)
+              else nullcontext()):
+            entries = self.paginate_queryset(TimelineEntry.objects.filter(
+                user=request.user
+            ).values('recipe_id', 'pub_date'))
+            rows = {
+                row['id']: row for row in RecipeValuesSerializer.get_values(
+                    Recipe.objects.get_recipe_filters(request.user).filter(
+                        id__in=[entry['recipe_id'] for entry in entries]
+                    )
+                )
+            }
+            serializer = RecipeValuesSerializer(
+                [rows[entry['recipe_id']] for entry in entries
+                 if entry['recipe_id'] in rows],
+                many=True,
+                context=self.get_serializer_context()
+            )
+            return self.get_paginated_response(serializer.data)
+
     @action(detail=True,
             permission_classes=(IsAuthenticated,), methods=('post',))
     def favorite(self, request, pk):
@@ -89,26 +184,22 @@ class RecipeViewSet(ModelViewSet):
             permission_classes=(IsAuthenticated,))
     def download_shopping_cart(self, request):
         """Скачивание списка покупок."""
-        ingredients = (
-            RecipeIngredient.objects.filter(
-                recipe__shoppingcarts__user=request.user
-            ).values(
-                'ingredient__name',
-                'ingredient__measurement_unit'
-            ).annotate(
-                ingredient_amount=Sum(
-                    'amount'
-                )
-            ).order_by(
-                'ingredient__name'
-            )
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
+        ).values(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            ingredient_amount=F('amount')
+        ).order_by(
+            'ingredient__name'
         )
-        return draw_pdf_report(ingredients)
+        return draw_pdf_report(ingredients, request.user)
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(VersionedCacheMixin, ReadOnlyModelViewSet):
     """ViewSet для работы с тэгами."""
 
+    cache_namespace = CacheConstants.TAGS_NAMESPACE
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAuthorOrReadOnly,)
@@ -124,13 +215,16 @@ class UserViewSet(DjoserUserViewSet):
             return (IsAuthenticated(),)
         return super().get_permissions()
 
+    def get_queryset(self):
+        if self.action == 'subscriptions':
+            return User.objects.filter(following__user=self.request.user)
+        return super().get_queryset()
+
     @action(methods=('get',), detail=False,
             permission_classes=(IsAuthenticated,),
             serializer_class=SubscriptionsListSerializer)
     def subscriptions(self, request):
-        queryset = self.filter_queryset(
-            User.objects.filter(following__user=self.request.user)
-        )
+        queryset = self.filter_queryset(self.get_queryset())
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
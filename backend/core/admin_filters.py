@@ -0,0 +1,36 @@
+from django.contrib import admin
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Фильтр с текстовым полем вместо списка всех значений поля:
+    для больших таблиц такой список строится слишком долго."""
+
+    template = 'admin/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        return ((None, None),)
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.lookup: self.value().strip()})
+        return queryset
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice['query_parts'] = [
+            (key, value)
+            for key, value in changelist.get_filters_params().items()
+            if key != self.parameter_name
+        ]
+        yield all_choice
+
+
+def input_filter(lookup, title):
+    """Создаёт InputFilter для поиска по lookup, например
+    author__username."""
+    return type(f'{lookup.title().replace("_", "")}Filter', (InputFilter,), {
+        'lookup': lookup,
+        'title': title,
+        'parameter_name': lookup,
+    })
@@ -0,0 +1,105 @@
+from collections import OrderedDict
+from copy import deepcopy
+from hashlib import sha256
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """Кеш соответствия токена пользователю.
+
+    По умолчанию это ограниченный по размеру LRU-кеш в памяти процесса
+    с временем жизни записей TOKEN_CACHE_TIMEOUT, каждый запрос получает
+    свою копию пользователя. Если задан TOKEN_CACHE_ALIAS, используется
+    общий кеш Django с этим именем, и сброс записи сразу виден всем
+    процессам."""
+
+    def __init__(self):
+        self._items = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _make_key(token_key):
+        return f'auth_token:{sha256(token_key.encode()).hexdigest()}'
+
+    @property
+    def _shared_cache(self):
+        if settings.TOKEN_CACHE_ALIAS:
+            return caches[settings.TOKEN_CACHE_ALIAS]
+        return None
+
+    def get(self, token_key):
+        key = self._make_key(token_key)
+        if self._shared_cache is not None:
+            value = self._shared_cache.get(key)
+        else:
+            with self._lock:
+                value, expires = self._items.get(key, (None, 0))
+                if value is not None and expires > monotonic():
+                    self._items.move_to_end(key)
+                    value = deepcopy(value)
+                else:
+                    self._items.pop(key, None)
+                    value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, token_key, value):
+        key = self._make_key(token_key)
+        if self._shared_cache is not None:
+            self._shared_cache.set(key, value, settings.TOKEN_CACHE_TIMEOUT)
+            return
+        with self._lock:
+            self._items[key] = (deepcopy(value),
+                                monotonic() + settings.TOKEN_CACHE_TIMEOUT)
+            self._items.move_to_end(key)
+            while len(self._items) > settings.TOKEN_CACHE_SIZE:
+                self._items.popitem(last=False)
+
+    def delete(self, *token_keys):
+        keys = [self._make_key(token_key) for token_key in token_keys]
+        if self._shared_cache is not None:
+            self._shared_cache.delete_many(keys)
+            return
+        with self._lock:
+            for key in keys:
+                self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Счётчики попаданий и промахов текущего процесса."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._items),
+            }
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, который не обращается к базе, пока
+    пользователь токена есть в кеше."""
+
+    def authenticate_credentials(self, key):
+        credentials = token_cache.get(key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            token_cache.set(key, credentials)
+        return credentials
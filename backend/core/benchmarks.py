@@ -0,0 +1,416 @@
+import platform
+import statistics
+from io import StringIO
+from itertools import cycle, islice
+from time import perf_counter
+
+import django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.filters import IngredientFilter, RecipeFilter
+from api.pagination import RecipeCursorPaginator
+from api.serializers import (RecipeGetSerializer,
+                             RecipePostSerializer,
+                             RecipeValuesSerializer,
+                             SubscriptionsListSerializer)
+from api.views import UserViewSet
+from core.cache import bump_data_version
+from core.constants import CacheConstants
+from core.pdf_reporter import draw_pdf_report
+from core.renderers import FastJSONRenderer
+from core.search import ingredient_index
+from recipes.models import (Favorite,
+                            Ingredient,
+                            Recipe,
+                            RecipeIngredient,
+                            ShoppingCart,
+                            ShoppingListItem,
+                            Tag,
+                            TagRecipe,
+                            TimelineEntry)
+from users.models import Subscription, User
+
+PNG_IMAGE = ('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk'
+             '+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+RECIPE_TEXT = (
+    'Подготовьте и вымойте все ингредиенты. Нарежьте овощи небольшими '
+    'кубиками и обжарьте на среднем огне до мягкости. Добавьте специи, '
+    'посолите и поперчите по вкусу, затем томите под крышкой двадцать '
+    'минут. Перед подачей дайте блюду настояться и украсьте зеленью.'
+)
+INGREDIENTS_PER_RECIPE = 5
+TAGS_PER_RECIPE = 3
+RECIPES_PER_AUTHOR = 10
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Регистрирует подготовку замера: функция получает пользователя,
+    от имени которого выполняются запросы, и возвращает измеряемую
+    функцию."""
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def make_request(user, **params):
+    request = Request(RequestFactory().get('/', params))
+    request.user = user
+    return request
+
+
+def populate(scale):
+    """Заполняет базу данными для замера: scale рецептов по десять
+    на автора, на всех авторов подписан пользователь, каждый третий
+    рецепт у него в избранном и в корзине."""
+    Tag.objects.bulk_create(
+        Tag(name=f'Тэг {i}', color=f'#{i:06x}', slug=f'tag-{i}')
+        for i in range(6)
+    )
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'Ингредиент {i}', measurement_unit='г')
+        for i in range(max(scale, 100))
+    )
+    bump_data_version(CacheConstants.INGREDIENTS_NAMESPACE)
+    user = User.objects.create_user(
+        email='benchmark@foodgram.ru', username='benchmark',
+        first_name='Benchmark', last_name='User'
+    )
+    User.objects.bulk_create(
+        User(email=f'author{i}@foodgram.ru', username=f'author{i}',
+             first_name='Author', last_name=str(i))
+        for i in range(max(scale // RECIPES_PER_AUTHOR, 1))
+    )
+    authors = list(User.objects.filter(username__startswith='author'))
+    Subscription.objects.bulk_create(
+        Subscription(user=user, author=author) for author in authors
+    )
+    Recipe.objects.bulk_create(
+        Recipe(author=author, name=f'Рецепт {i}',
+               text=f'Рецепт номер {i}. {RECIPE_TEXT}',
+               cooking_time=i % 120 + 1, image='recipes/benchmark.png')
+        for i, author in enumerate(islice(cycle(authors), scale))
+    )
+    tags = list(Tag.objects.all())
+    ingredients = list(Ingredient.objects.all())
+    recipes = list(Recipe.objects.all())
+    TagRecipe.objects.bulk_create(
+        TagRecipe(recipe=recipe, tag=tags[(i + j) % len(tags)])
+        for i, recipe in enumerate(recipes)
+        for j in range(TAGS_PER_RECIPE)
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient=ingredients[(i + j) % len(ingredients)],
+            amount=j + 1
+        )
+        for i, recipe in enumerate(recipes)
+        for j in range(INGREDIENTS_PER_RECIPE)
+    )
+    for model in (Favorite, ShoppingCart):
+        model.objects.bulk_create(
+            model(user=user, recipe=recipe) for recipe in recipes[::3]
+        )
+    call_command('rebuild_shopping_lists', stdout=StringIO())
+    call_command('reconcile_counters', stdout=StringIO())
+    call_command('rebuild_timelines', stdout=StringIO())
+    return user
+
+
+def measure(func, rounds, warmup=1):
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(rounds):
+        start = perf_counter()
+        func()
+        timings.append(perf_counter() - start)
+    mean = statistics.mean(timings)
+    return {
+        'rounds': rounds,
+        'min': min(timings),
+        'max': max(timings),
+        'mean': mean,
+        'median': statistics.median(timings),
+        'stddev': statistics.stdev(timings) if rounds > 1 else 0.0,
+        'ops': 1 / mean if mean else 0.0,
+    }
+
+
+def run_benchmarks(scales, rounds, names=None):
+    """Выполняет замеры для каждого масштаба данных. Данные каждого
+    масштаба создаются в транзакции, которая затем откатывается."""
+    results = []
+    for scale in scales:
+        with transaction.atomic():
+            user = populate(scale)
+            for name, setup in BENCHMARKS.items():
+                if names and name not in names:
+                    continue
+                results.append({
+                    'name': name,
+                    'scale': scale,
+                    'stats': measure(setup(user), rounds),
+                })
+            transaction.set_rollback(True)
+    return {
+        'machine_info': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'benchmarks': results,
+    }
+
+
+def compare_results(results, baseline, threshold):
+    """Возвращает замеры, медиана которых выросла относительно
+    базового прогона больше чем на threshold процентов."""
+    baseline_medians = {
+        (item['name'], item['scale']): item['stats']['median']
+        for item in baseline['benchmarks']
+    }
+    regressions = []
+    for item in results['benchmarks']:
+        previous = baseline_medians.get((item['name'], item['scale']))
+        if not previous:
+            continue
+        change = (item['stats']['median'] / previous - 1) * 100
+        if change > threshold:
+            regressions.append((item['name'], item['scale'], change))
+    return regressions
+
+
+def _rollback(func):
+    """Изменения, сделанные замером, откатываются после каждого раунда,
+    чтобы все раунды работали с одинаковыми данными."""
+    def wrapper():
+        with transaction.atomic():
+            func()
+            transaction.set_rollback(True)
+    return wrapper
+
+
+@benchmark('recipe_list_serializer')
+def recipe_list_serializer(user):
+    context = {'request': make_request(user)}
+
+    def run():
+        return RecipeGetSerializer(
+            Recipe.objects.with_related().get_recipe_filters(user),
+            many=True,
+            context=context
+        ).data
+    return run
+
+
+def _serialize_recipe_values(user, cold):
+    context = {'request': make_request(user)}
+
+    def run():
+        if cold:
+            cache.clear()
+        return RecipeValuesSerializer(
+            RecipeValuesSerializer.get_values(
+                Recipe.objects.get_recipe_filters(user)
+            ),
+            many=True,
+            context=context
+        ).data
+    return run
+
+
+@benchmark('recipe_list_values')
+def recipe_list_values(user):
+    return _serialize_recipe_values(user, cold=False)
+
+
+@benchmark('recipe_list_values_cold')
+def recipe_list_values_cold(user):
+    return _serialize_recipe_values(user, cold=True)
+
+
+def _render_recipe_list(renderer_class, user):
+    data = {
+        'count': Recipe.objects.count(),
+        'next': None,
+        'previous': None,
+        'results': RecipeGetSerializer(
+            Recipe.objects.with_related().get_recipe_filters(user),
+            many=True,
+            context={'request': make_request(user)}
+        ).data,
+    }
+    renderer = renderer_class()
+
+    def run():
+        return renderer.render(data, 'application/json')
+    return run
+
+
+@benchmark('recipe_list_json_stdlib')
+def recipe_list_json_stdlib(user):
+    return _render_recipe_list(JSONRenderer, user)
+
+
+@benchmark('recipe_list_json_fast')
+def recipe_list_json_fast(user):
+    return _render_recipe_list(FastJSONRenderer, user)
+
+
+def _tag_filter(user, filter_tags):
+    slugs = list(Tag.objects.values_list('slug', flat=True))
+
+    def run():
+        queryset = filter_tags(Recipe.objects.get_recipe_filters(user), slugs)
+        return list(queryset[:6]), queryset.count()
+    return run
+
+
+@benchmark('recipe_tag_filter')
+def recipe_tag_filter(user):
+    request = make_request(user)
+    return _tag_filter(user, lambda queryset, slugs: RecipeFilter(
+        {'tags': slugs}, queryset=queryset, request=request
+    ).qs)
+
+
+@benchmark('recipe_tag_filter_distinct')
+def recipe_tag_filter_distinct(user):
+    """Прежний фильтр через JOIN с тэгами и DISTINCT на тех же данных."""
+    return _tag_filter(user, lambda queryset, slugs: queryset.filter(
+        tags__slug__in=slugs
+    ).distinct())
+
+
+def _feed_page(user, queryset):
+    request = make_request(user)
+
+    def run():
+        return RecipeCursorPaginator().paginate_queryset(queryset, request)
+    return run
+
+
+@benchmark('recipe_feed_timeline')
+def recipe_feed_timeline(user):
+    return _feed_page(user, TimelineEntry.objects.filter(
+        user=user
+    ).values('recipe_id', 'pub_date'))
+
+
+@benchmark('recipe_feed_author_in')
+def recipe_feed_author_in(user):
+    return _feed_page(user, Recipe.objects.filter(
+        author__in=Subscription.objects.filter(
+            user=user
+        ).values('author_id')
+    ).values('id', 'pub_date'))
+
+
+@benchmark('recipe_search')
+def recipe_search(user):
+    def run():
+        return list(Recipe.objects.search('рецепт 7')[:6])
+    return run
+
+
+@benchmark('subscriptions_serializer')
+def subscriptions_serializer(user):
+    request = make_request(user, recipes_limit=3)
+    view = UserViewSet(request=request, action='subscriptions',
+                       format_kwarg=None, kwargs={})
+
+    def run():
+        return SubscriptionsListSerializer(
+            view.get_queryset(), many=True, context={'request': request}
+        ).data
+    return run
+
+
+def _recipe_payload(ingredients, tags):
+    return {
+        'ingredients': [{'id': ingredient, 'amount': 10}
+                        for ingredient in ingredients],
+        'tags': tags,
+        'image': f'data:image/png;base64,{PNG_IMAGE}',
+        'name': 'Новый рецепт',
+        'text': 'Описание нового рецепта',
+        'cooking_time': 10,
+    }
+
+
+@benchmark('recipe_create')
+def recipe_create(user):
+    context = {'request': make_request(user)}
+    payload = _recipe_payload(
+        Ingredient.objects.values_list('id', flat=True)[:10],
+        Tag.objects.values_list('id', flat=True)[:3]
+    )
+
+    @_rollback
+    def run():
+        serializer = RecipePostSerializer(data=payload, context=context)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return serializer.data
+    return run
+
+
+@benchmark('recipe_update')
+def recipe_update(user):
+    recipe = Recipe.objects.select_related('author').first()
+    context = {'request': make_request(recipe.author)}
+    current = set(recipe.recipeingredients.values_list('ingredient_id',
+                                                       flat=True))
+    payload = _recipe_payload(
+        Ingredient.objects.exclude(
+            id__in=current
+        ).values_list('id', flat=True)[:INGREDIENTS_PER_RECIPE],
+        Tag.objects.values_list('id', flat=True)[:2]
+    )
+
+    @_rollback
+    def run():
+        serializer = RecipePostSerializer(recipe, data=payload,
+                                          context=context)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return serializer.data
+    return run
+
+
+@benchmark('shopping_list_pdf')
+def shopping_list_pdf(user):
+    def run():
+        cache.delete(f'shopping_list_pdf:{user.id}')
+        items = ShoppingListItem.objects.filter(user=user).values(
+            'ingredient__name', 'ingredient__measurement_unit',
+            ingredient_amount=F('amount')
+        ).order_by('ingredient__name')
+        draw_pdf_report(items, user).close()
+    return run
+
+
+@benchmark('ingredient_filter')
+def ingredient_filter(user):
+    def run():
+        return list(IngredientFilter(
+            {'name': 'Ингредиент 1'}, queryset=Ingredient.objects.all()
+        ).qs)
+    return run
+
+
+@benchmark('ingredient_index_search')
+def ingredient_index_search(user):
+    def run():
+        return ingredient_index.search('Ингредиент 1')
+    return run
@@ -0,0 +1,88 @@
+from time import time_ns
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.db.models import F
+
+from core.constants import CacheConstants
+from core.models import DataVersion
+
+
+def _version_key(namespace):
+    return f'version:{namespace}'
+
+
+def get_data_versions(namespaces):
+    """Текущие версии нескольких пространств имён.
+
+    Версии хранятся в базе, а в кеше запоминаются на
+    DATA_VERSION_TIMEOUT секунд. С общим кешем новая версия сразу
+    видна всем процессам, с кешем в памяти процесса — не позже чем
+    через DATA_VERSION_TIMEOUT секунд. Версии читаются из той же базы,
+    что и сами данные, а недостающие создаются в основной базе.
+    Начальное значение берётся из текущего времени, чтобы не совпасть
+    с версиями, под которыми данные могли остаться в кеше от прошлой
+    базы."""
+    keys = {_version_key(namespace): namespace for namespace in namespaces}
+    versions = {keys[key]: version
+                for key, version in cache.get_many(keys).items()}
+    missing = [namespace for namespace in keys.values()
+               if namespace not in versions]
+    if missing:
+        stored = dict(DataVersion.objects.filter(
+            namespace__in=missing
+        ).values_list('namespace', 'version'))
+        if len(stored) < len(missing):
+            queryset = DataVersion.objects.using(
+                router.db_for_write(DataVersion)
+            )
+            queryset.bulk_create(
+                [DataVersion(namespace=namespace, version=time_ns())
+                 for namespace in missing if namespace not in stored],
+                ignore_conflicts=True
+            )
+            stored = dict(queryset.filter(
+                namespace__in=missing
+            ).values_list('namespace', 'version'))
+        cache.set_many(
+            {_version_key(namespace): version
+             for namespace, version in stored.items()},
+            settings.DATA_VERSION_TIMEOUT
+        )
+        versions.update(stored)
+    return versions
+
+
+def get_data_version(namespace):
+    """Текущая версия данных пространства имён."""
+    return get_data_versions((namespace,))[namespace]
+
+
+def bump_data_version(namespace):
+    """Делает недействительными все данные, закешированные
+    под предыдущей версией."""
+    queryset = DataVersion.objects.using(router.db_for_write(DataVersion))
+    if not queryset.filter(namespace=namespace).update(
+        version=F('version') + 1
+    ):
+        queryset.get_or_create(namespace=namespace,
+                               defaults={'version': time_ns()})
+    cache.delete(_version_key(namespace))
+
+
+def get_recipe_body_keys(rows):
+    """Ключи кеша общей части ответа для строк рецептов.
+
+    Ключ включает версию рецепта из его строки и версии справочников
+    тэгов и ингредиентов, поэтому изменение любого из них делает
+    закешированный ответ недействительным."""
+    versions = get_data_versions((CacheConstants.TAGS_NAMESPACE,
+                                  CacheConstants.INGREDIENTS_NAMESPACE))
+    catalog_version = (f'{versions[CacheConstants.TAGS_NAMESPACE]}.'
+                       f'{versions[CacheConstants.INGREDIENTS_NAMESPACE]}')
+    return {
+        row['id']: f'recipe_body:{row["id"]}:{row["version"]}.'
+                   f'{catalog_version}'
+        for row in rows
+    }
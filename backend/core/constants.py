@@ -14,6 +14,7 @@ class RecipeConstants:
     MAX_COOKING_TIME = 32767
     MAXIMUM_AMOUNT_ALLOWED = 10000
     MIN_VALUE = 1
+    INGREDIENT_SEARCH_LIMIT = 20
 
 
 class UserConstants:
@@ -24,3 +25,71 @@ class UserConstants:
     STR_RETURN_VALUE = 30
     RECIPES_AMOUNT = 'Количество рецептов'
     SUBSCRIBERS_AMOUNT = 'Количество подписчиков'
+    SUBSCRIPTIONS_AMOUNT = 'Количество подписок'
+
+
+class ReportConstants:
+    """Константы для отчёта со списком покупок."""
+
+    FONT_NAME = 'FreeSans'
+    FONT_SIZE = 14
+    REPORT_MAX_MEMORY_SIZE = 1024 * 1024
+    REPORT_MAX_CACHED_SIZE = 256 * 1024
+
+
+class ImageConstants:
+    """Уменьшенные копии изображений рецептов."""
+
+    VARIANTS = {
+        'image_thumbnail': (320, 320),
+        'image_medium': (960, 960),
+    }
+    VARIANTS_DIRECTORY = 'recipes/variants'
+    VARIANTS_FORMAT = 'WEBP'
+    VARIANTS_QUALITY = 80
+
+
+class CacheConstants:
+    """Пространства имён версий закешированных данных."""
+
+    TAGS_NAMESPACE = 'tags'
+    INGREDIENTS_NAMESPACE = 'ingredients'
+    # Поля автора, которые входят в закешированные ответы с рецептами.
+    AUTHOR_FIELDS = frozenset(('email', 'username', 'first_name',
+                               'last_name'))
+
+
+class DatasetConstants:
+    """Размеры синтетического набора данных при масштабе 1."""
+
+    USERS = 100_000
+    RECIPES = 1_000_000
+    AUTHORS_SHARE = 0.2
+    SUBSCRIPTIONS_PER_USER = 15
+    FAVORITES_PER_USER = 20
+    SHOPPING_CART_PER_USER = 10
+    TAGS_PER_RECIPE = (1, 3)
+    INGREDIENTS_PER_RECIPE = (3, 10)
+    COOKING_TIME = (5, 180)
+    AMOUNT = (1, 500)
+    POPULARITY_SKEW = 3
+    PUBLICATION_PERIOD_DAYS = 365
+    PLACEHOLDER_IMAGES = 16
+    PLACEHOLDER_IMAGE_SIZE = (8, 8)
+    USERNAME_PREFIX = 'dataset_'
+    EMAIL_DOMAIN = 'dataset.foodgram.ru'
+
+
+class FeedConstants:
+    """Лента рецептов авторов из подписок."""
+
+    BACKFILL_SIZE = 20
+    BATCH_SIZE = 1000
+
+
+class DatabaseConstants:
+    """Псевдонимы баз данных и закрепление чтения за основной базой."""
+
+    PRIMARY_ALIAS = 'default'
+    REPLICA_ALIAS = 'replica'
+    PRIMARY_PIN_COOKIE = 'primary_pin'
@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import F
+from PIL import Image
+
+from core.constants import ImageConstants
+from recipes.models import Recipe
+
+executor = ThreadPoolExecutor(max_workers=1,
+                              thread_name_prefix='image-variants')
+
+
+def get_variant_name(image_name, field_name):
+    stem = PurePosixPath(image_name).stem
+    return (f'{ImageConstants.VARIANTS_DIRECTORY}/{stem}_'
+            f'{field_name.split("_", 1)[1]}.'
+            f'{ImageConstants.VARIANTS_FORMAT.lower()}')
+
+
+def has_actual_variants(recipe):
+    return all(
+        getattr(recipe, field_name).name
+        == get_variant_name(recipe.image.name, field_name)
+        for field_name in ImageConstants.VARIANTS
+    )
+
+
+def make_image_variants(recipe_id):
+    """Создаёт уменьшенные копии изображения рецепта и сохраняет их
+    в рецепт, если изображение за это время не сменилось."""
+    recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return
+    with recipe.image.open('rb') as file:
+        original = Image.open(file)
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA')
+    variants = {}
+    for field_name, size in ImageConstants.VARIANTS.items():
+        variant = original.copy()
+        variant.thumbnail(size)
+        content = BytesIO()
+        variant.save(content, ImageConstants.VARIANTS_FORMAT,
+                     quality=ImageConstants.VARIANTS_QUALITY)
+        name = get_variant_name(recipe.image.name, field_name)
+        storage = recipe.image.storage
+        storage.delete(name)
+        variants[field_name] = storage.save(name,
+                                            ContentFile(content.getvalue()))
+    Recipe.objects.filter(pk=recipe_id, image=recipe.image.name).update(
+        version=F('version') + 1, **variants
+    )
+
+
+def _make_image_variants_in_background(recipe_id):
+    try:
+        make_image_variants(recipe_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_image_variants(recipe):
+    """Ставит создание копий в очередь фонового потока после
+    фиксации транзакции, чтобы не задерживать ответ на запрос."""
+    if recipe.image and not has_actual_variants(recipe):
+        transaction.on_commit(lambda: executor.submit(
+            _make_image_variants_in_background, recipe.id
+        ))
@@ -0,0 +1,125 @@
+import json
+import logging
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from core.constants import DatabaseConstants
+from core.routers import read_from_replica
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTiming:
+    """Замеры одного запроса: SQL-запросы с их длительностью и время
+    работы представления и отрисовки ответа."""
+
+    def __init__(self):
+        self.queries = []
+        self.view_started = None
+        self.view_time = 0.0
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((perf_counter() - start, sql))
+
+    @property
+    def db_time(self):
+        return sum(duration for duration, _ in self.queries)
+
+
+class RequestTimingMiddleware:
+    """Добавляет к ответу заголовки Server-Timing и X-Query-Count
+    и пишет в лог строку с замерами запроса.
+
+    В лог попадают запросы не быстрее REQUEST_TIMING_SLOW_MS
+    вместе с REQUEST_TIMING_SLOWEST_QUERIES самыми долгими SQL."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = request.timing = RequestTiming()
+        start = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timing))
+            response = self.get_response(request)
+        total_time = perf_counter() - start
+        if timing.view_started is not None and not timing.view_time:
+            timing.view_time = perf_counter() - timing.view_started
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration * 1000:.1f}' for name, duration in (
+                ('db', timing.db_time),
+                ('view', timing.view_time),
+                ('render', timing.render_time),
+                ('total', total_time),
+            )
+        )
+        response['X-Query-Count'] = str(len(timing.queries))
+        if total_time * 1000 >= settings.REQUEST_TIMING_SLOW_MS:
+            self._log(request, response, timing, total_time)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.timing.view_started = perf_counter()
+
+    def process_template_response(self, request, response):
+        timing = request.timing
+        view_finished = perf_counter()
+        timing.view_time = view_finished - timing.view_started
+
+        def finish_render(response):
+            timing.render_time = perf_counter() - view_finished
+
+        response.add_post_render_callback(finish_render)
+        return response
+
+    def _log(self, request, response, timing, total_time):
+        slowest = sorted(timing.queries, key=lambda query: query[0],
+                         reverse=True)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'queries': len(timing.queries),
+            'db_ms': round(timing.db_time * 1000, 1),
+            'view_ms': round(timing.view_time * 1000, 1),
+            'render_ms': round(timing.render_time * 1000, 1),
+            'total_ms': round(total_time * 1000, 1),
+            'slowest_queries': [
+                {'ms': round(duration * 1000, 1), 'sql': sql}
+                for duration, sql
+                in slowest[:settings.REQUEST_TIMING_SLOWEST_QUERIES]
+            ],
+        }, ensure_ascii=False))
+
+
+class ReplicaPinningMiddleware:
+    """Чтение в безопасных запросах идёт на реплику. После изменяющего
+    запроса клиент получает cookie, и в течение REPLICA_PIN_SECONDS
+    его запросы читают из основной базы, чтобы он сразу видел свои
+    изменения, даже если реплика ещё отстаёт."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        safe = request.method in SAFE_METHODS
+        pinned = DatabaseConstants.PRIMARY_PIN_COOKIE in request.COOKIES
+        with read_from_replica(safe and not pinned):
+            response = self.get_response(request)
+        if not safe:
+            response.set_cookie(
+                DatabaseConstants.PRIMARY_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
@@ -24,3 +24,21 @@ class UserRecipeBaseModel(models.Model):
             )
         ]
         abstract = True
+
+
+class DataVersion(models.Model):
+    """Версия данных пространства имён для сброса кешей.
+
+    Хранится в базе, чтобы изменение, сделанное в любом процессе,
+    в том числе management-командой, было видно всем процессам."""
+
+    namespace = models.CharField('Пространство имён', max_length=100,
+                                 unique=True)
+    version = models.BigIntegerField('Версия')
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+
+    def __str__(self):
+        return f'{self.namespace}: {self.version}'
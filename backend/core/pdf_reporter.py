@@ -1,29 +1,75 @@
-import io
+from functools import lru_cache
+from hashlib import sha1
+from tempfile import SpooledTemporaryFile
 
+from django.conf import settings
+from django.core.cache import cache
 from django.http.response import FileResponse
+from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 
+from core.constants import ReportConstants
 from core.services import prepare_ingredients_list
 
 
-def draw_pdf_report(items):
-    """Рисуем отчёт о предстоящих покупках в виде PDF-файла."""
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer)
-    pdfmetrics.registerFont(TTFont('FreeSans', 'fonts/FreeSans.ttf'))
-    p.setFont('FreeSans', 14)
-    p.drawCentredString(
-        300, 800,
-        'Ваш список покупок:')
-    text_object = p.beginText(2 * cm, 29.7 * cm - 2 * cm)
-    for line in prepare_ingredients_list(items).splitlines(False):
+@lru_cache(maxsize=None)
+def register_fonts():
+    """Шрифт разбирается один раз за время жизни процесса."""
+    pdfmetrics.registerFont(TTFont(
+        ReportConstants.FONT_NAME,
+        settings.BASE_DIR / 'fonts' / f'{ReportConstants.FONT_NAME}.ttf'
+    ))
+
+
+def _begin_page(pdf, top):
+    pdf.setFont(ReportConstants.FONT_NAME, ReportConstants.FONT_SIZE)
+    return pdf.beginText(2 * cm, top)
+
+
+def _draw_lines(pdf, lines):
+    """Раскладываем строки по страницам, начиная новую страницу,
+    когда текущая заполнена."""
+    _, height = A4
+    text_object = _begin_page(pdf, height - 2 * cm)
+    pdf.drawCentredString(300, 800, 'Ваш список покупок:')
+    for line in lines:
+        if text_object.getY() < 2 * cm:
+            pdf.drawText(text_object)
+            pdf.showPage()
+            text_object = _begin_page(pdf, height - 2 * cm)
         text_object.textLine(line.rstrip())
-    p.drawText(text_object)
-    p.showPage()
-    p.save()
+    pdf.drawText(text_object)
+    pdf.showPage()
+
+
+def draw_pdf_report(items, user):
+    """Рисуем отчёт о предстоящих покупках в виде PDF-файла.
+
+    Готовый файл кешируется для пользователя вместе с хешем
+    содержимого списка и отдаётся повторно, пока список не изменится.
+    Файл собирается во временном файле, который держится в памяти
+    только до REPORT_MAX_MEMORY_SIZE байт, и отдаётся клиенту
+    потоком."""
+    shopping_list = prepare_ingredients_list(items)
+    digest = sha1(shopping_list.encode()).hexdigest()
+    cache_key = f'shopping_list_pdf:{user.id}'
+    cached = cache.get(cache_key)
+    buffer = SpooledTemporaryFile(
+        max_size=ReportConstants.REPORT_MAX_MEMORY_SIZE
+    )
+    if cached is not None and cached[0] == digest:
+        buffer.write(cached[1])
+    else:
+        register_fonts()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        _draw_lines(pdf, shopping_list.splitlines(False))
+        pdf.save()
+        if buffer.tell() <= ReportConstants.REPORT_MAX_CACHED_SIZE:
+            buffer.seek(0)
+            cache.set(cache_key, (digest, buffer.read()))
     buffer.seek(0)
     return FileResponse(buffer, as_attachment=True,
                         filename='shopping_list.pdf')
@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from core.constants import DatabaseConstants
+
+replica_reads_allowed = ContextVar('replica_reads_allowed', default=False)
+
+
+@contextmanager
+def read_from_replica(allowed=True):
+    """Разрешает чтение с реплики внутри блока. Вне такого блока,
+    например в management-командах, все запросы идут в основную
+    базу."""
+    token = replica_reads_allowed.set(allowed)
+    try:
+        yield
+    finally:
+        replica_reads_allowed.reset(token)
+
+
+class ReplicaRouter:
+    """Отправляет чтение на реплику, если оно разрешено для текущего
+    запроса, а запись и миграции в основную базу."""
+
+    def db_for_read(self, model, **hints):
+        if replica_reads_allowed.get():
+            return DatabaseConstants.REPLICA_ALIAS
+        return DatabaseConstants.PRIMARY_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DatabaseConstants.PRIMARY_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DatabaseConstants.PRIMARY_ALIAS
@@ -0,0 +1,63 @@
+from bisect import bisect_left
+from heapq import nsmallest
+from threading import Lock
+
+from core.cache import get_data_version
+from core.constants import CacheConstants
+from recipes.models import Ingredient
+
+PREFIX_UPPER_BOUND = '\U0010ffff'
+
+
+class IngredientIndex:
+    """Индекс названий ингредиентов в памяти процесса.
+
+    Строится лениво при первом поиске и перестраивается, когда
+    меняется версия данных ингредиентов. Совпадения по началу названия ищутся
+    бинарным поиском по отсортированному списку, совпадения по
+    подстроке добавляются вторым уровнем и ранжируются по позиции
+    вхождения; при заданном `limit` из них отбираются только
+    недостающие до лимита без сортировки всего списка."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._index = None
+        self._version = None
+
+    def _get_index(self):
+        version = get_data_version(CacheConstants.INGREDIENTS_NAMESPACE)
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    items = sorted(
+                        Ingredient.objects.values(
+                            'id', 'name', 'measurement_unit'
+                        ),
+                        key=lambda item: (item['name'].casefold(),
+                                          item['id'])
+                    )
+                    keys = [item['name'].casefold() for item in items]
+                    self._index = (keys, items)
+                    self._version = version
+        return self._index
+
+    def search(self, query, limit=None):
+        keys, items = self._get_index()
+        query = query.casefold()
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + PREFIX_UPPER_BOUND, start)
+        results = items[start:end][:limit]
+        if limit is not None and len(results) >= limit:
+            return results
+        positions = ((key.find(query), number)
+                     for number, key in enumerate(keys))
+        matches = (match for match in positions if match[0] > 0)
+        substring_matches = (
+            sorted(matches) if limit is None
+            else nsmallest(limit - len(results), matches)
+        )
+        results.extend(items[number] for _, number in substring_matches)
+        return results[:limit]
+
+
+ingredient_index = IngredientIndex()
@@ -1,10 +1,86 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import reduce
+from operator import or_
+from threading import local
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.transaction import atomic
 from rest_framework import status
 from rest_framework.response import Response
 
-from recipes.models import RecipeIngredient
+from core.constants import FeedConstants
+from recipes.models import (Favorite,
+                            Recipe,
+                            RecipeIngredient,
+                            ShoppingCart,
+                            ShoppingListItem,
+                            TimelineEntry)
+from users.models import Subscription, User
+
+shopping_lists_updated = ContextVar('shopping_lists_updated',
+                                    default=False)
+pending_versions = local()
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+    (User, 'following_count', Subscription, 'user'),
+)
+
+
+@contextmanager
+def updating_shopping_lists():
+    """Внутри блока изменения ингредиентов рецептов не пересчитывают
+    списки покупок через сигналы: вызывающий код переносит изменения
+    в них сам."""
+    token = shopping_lists_updated.set(True)
+    try:
+        yield
+    finally:
+        shopping_lists_updated.reset(token)
+
+
+@contextmanager
+def refreshing_shopping_lists(recipe_ids):
+    """Изменения ингредиентов и удаление рецептов внутри блока
+    переносятся в списки покупок одним пересчётом в конце блока, в той
+    же транзакции.
+
+    Пользователи, у которых рецепты в корзине, определяются до начала
+    блока, поэтому внутри него рецепты можно и удалять."""
+    with atomic():
+        user_ids = list(ShoppingCart.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('user_id', flat=True).distinct())
+        with updating_shopping_lists():
+            yield
+        refresh_shopping_lists(user_ids)
+
+
+def get_old_values(instance, *fields):
+    """Значения полей объекта, сохранённые в базе, или None
+    для нового объекта."""
+    if instance._state.adding:
+        return None
+    return type(instance).objects.filter(
+        pk=instance.pk
+    ).values(*fields).first()
+
+
+def get_old_value(instance, field):
+    """Значение поля до сохранения, запомненное в pre_save."""
+    return (getattr(instance, 'old_values', None) or {}).get(field)
 
 
 def pass_ingredients(ingredients, recipe):
+    if not ingredients:
+        return
     recipe_ingredients = [RecipeIngredient(
         recipe=recipe,
         ingredient=ingredient.get('id'),
@@ -13,6 +89,128 @@ def pass_ingredients(ingredients, recipe):
     RecipeIngredient.objects.bulk_create(recipe_ingredients)
 
 
+def update_recipe_ingredients(ingredients, recipe):
+    """Приводит ингредиенты рецепта к переданному списку, изменяя
+    только добавленные, удалённые и изменившиеся строки.
+
+    Возвращает количества ингредиентов до и после изменения."""
+    current = {
+        recipe_ingredient.ingredient_id: recipe_ingredient
+        for recipe_ingredient in RecipeIngredient.objects.filter(
+            recipe=recipe
+        )
+    }
+    old_amounts = {ingredient_id: recipe_ingredient.amount
+                   for ingredient_id, recipe_ingredient in current.items()}
+    new_amounts = {ingredient.get('id').id: ingredient.get('amount')
+                   for ingredient in ingredients}
+    removed = old_amounts.keys() - new_amounts.keys()
+    if removed:
+        with updating_shopping_lists():
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+    changed = []
+    for ingredient_id in old_amounts.keys() & new_amounts.keys():
+        if old_amounts[ingredient_id] != new_amounts[ingredient_id]:
+            current[ingredient_id].amount = new_amounts[ingredient_id]
+            changed.append(current[ingredient_id])
+    if changed:
+        RecipeIngredient.objects.bulk_update(changed, ('amount',))
+    pass_ingredients(
+        [ingredient for ingredient in ingredients
+         if ingredient.get('id').id not in old_amounts],
+        recipe
+    )
+    return old_amounts, new_amounts
+
+
+def get_recipe_amounts(recipe_id):
+    return dict(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('ingredient_id', 'amount'))
+
+
+def get_amounts_difference(old_amounts, new_amounts):
+    """Изменение количества каждого ингредиента между двумя
+    словарями вида {id ингредиента: количество}."""
+    return {
+        ingredient_id: new_amounts.get(ingredient_id, 0)
+        - old_amounts.get(ingredient_id, 0)
+        for ingredient_id in old_amounts.keys() | new_amounts.keys()
+        if new_amounts.get(ingredient_id, 0)
+        != old_amounts.get(ingredient_id, 0)
+    }
+
+
+@atomic
+def update_shopping_lists(user_ids, amounts):
+    """Прибавляет `amounts` ({id ингредиента: изменение}) к спискам
+    покупок пользователей за фиксированное число запросов.
+
+    Недостающие строки сначала создаются с нулевым количеством, чтобы
+    все нужные строки можно было заблокировать перед обновлением."""
+    user_ids = list(user_ids)
+    if not user_ids or not amounts:
+        return
+    ShoppingListItem.objects.bulk_create(
+        [ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                          amount=0)
+         for user_id in user_ids for ingredient_id in amounts],
+        ignore_conflicts=True
+    )
+    items = list(ShoppingListItem.objects.select_for_update().filter(
+        user_id__in=user_ids, ingredient_id__in=amounts
+    ))
+    for item in items:
+        item.amount = max(item.amount + amounts[item.ingredient_id], 0)
+    ShoppingListItem.objects.bulk_update(items, ('amount',))
+    ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=amounts, amount=0
+    ).delete()
+
+
+def update_carted_shopping_lists(recipe_id, old_amounts, new_amounts):
+    """Переносит изменение ингредиентов рецепта в списки покупок
+    всех пользователей, добавивших рецепт в корзину."""
+    amounts = get_amounts_difference(old_amounts, new_amounts)
+    if amounts:
+        update_shopping_lists(
+            ShoppingCart.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('user_id', flat=True),
+            amounts
+        )
+
+
+def get_shopping_list_totals(user_ids=None):
+    """Суммы ингредиентов по спискам покупок, посчитанные заново
+    по корзинам всех пользователей или только `user_ids`."""
+    if user_ids is None:
+        carts = Q(recipe__shoppingcarts__isnull=False)
+    else:
+        carts = Q(recipe__shoppingcarts__user__in=user_ids)
+    return RecipeIngredient.objects.filter(carts).values(
+        'recipe__shoppingcarts__user', 'ingredient'
+    ).annotate(total=Sum('amount')).order_by()
+
+
+@atomic
+def refresh_shopping_lists(user_ids):
+    """Пересчитывает списки покупок пользователей заново по их
+    корзинам."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(user_id=row['recipe__shoppingcarts__user'],
+                         ingredient_id=row['ingredient'],
+                         amount=row['total'])
+        for row in get_shopping_list_totals(user_ids)
+    )
+
+
 def prepare_ingredients_list(ingredients):
     shopping_list = []
     for item in ingredients:
@@ -26,6 +224,19 @@ def prepare_ingredients_list(ingredients):
     return ' '.join(shopping_list)
 
 
+def get_recipes_by_author(author_ids, limit=None):
+    """Рецепты для списка подписок, сгруппированные по авторам."""
+    recipes_by_author = {author_id: [] for author_id in author_ids}
+    if limit is None:
+        recipes = Recipe.objects.filter(author_id__in=author_ids)
+    else:
+        recipes = Recipe.objects.limit_per_author(author_ids, limit)
+    for recipe in recipes:
+        recipes_by_author[recipe.author_id].append(recipe)
+    return recipes_by_author
+
+
+@atomic
 def _create_related_object(pk, request, serializer_class):
     serializer = serializer_class(
         data={
@@ -38,9 +249,154 @@ def _create_related_object(pk, request, serializer_class):
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@atomic
 def _delete_related_object(pk, request, model):
     if not model.objects.filter(user=request.user, recipe=pk).exists():
         return Response(status=status.HTTP_400_BAD_REQUEST,
                         data={'message': 'Запрашиваемый объект не найден'})
     model.objects.filter(user=request.user, recipe=pk).delete()
     return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет счётчик в базе, не опускаясь ниже нуля."""
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def move_counter(model, field, old_pk, new_pk):
+    """Переносит единицу счётчика со старого объекта на новый, если
+    связь сохранённой строки изменилась, например в админке."""
+    if old_pk is not None and old_pk != new_pk:
+        change_counter(model, old_pk, field, -1)
+        change_counter(model, new_pk, field, 1)
+
+
+def _bump_pending_recipe_versions():
+    recipe_ids = getattr(pending_versions, 'recipe_ids', None)
+    pending_versions.recipe_ids = set()
+    if recipe_ids:
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            version=F('version') + 1
+        )
+
+
+def schedule_recipe_versions_bump(recipe_ids):
+    """Повышает версии рецептов после фиксации транзакции.
+
+    Рецепты, затронутые за транзакцию, собираются вместе: первый
+    обработчик после фиксации повышает все версии одним запросом,
+    остальные находят список пустым."""
+    if not hasattr(pending_versions, 'recipe_ids'):
+        pending_versions.recipe_ids = set()
+    pending_versions.recipe_ids.update(recipe_ids)
+    transaction.on_commit(_bump_pending_recipe_versions,
+                          using=router.db_for_write(Recipe))
+
+
+def discard_recipe_versions_bump(recipe_id):
+    """Версию удалённого рецепта повышать уже не нужно."""
+    getattr(pending_versions, 'recipe_ids', set()).discard(recipe_id)
+
+
+def bump_author_recipe_versions(author_id):
+    """Данные автора входят в ответ с каждым его рецептом."""
+    Recipe.objects.filter(author_id=author_id).update(
+        version=F('version') + 1
+    )
+
+
+def count_related(related_model, related_field):
+    """Подзапрос с фактическим количеством связанных строк для счётчика."""
+    return Coalesce(Subquery(
+        related_model.objects.filter(
+            **{related_field: OuterRef('pk')}
+        ).order_by().values(related_field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def fan_out_recipe(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора.
+
+    Рецепты авторов, у которых не меньше FEED_FANOUT_MAX_FOLLOWERS
+    подписчиков, не рассылаются: подписчики забирают их сами при
+    чтении ленты в pull_timeline."""
+    if User.objects.filter(
+        pk=recipe.author_id,
+        followers_count__gte=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).exists():
+        return
+    follower_ids = Subscription.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, recipe_id=recipe.id,
+                       author_id=recipe.author_id, pub_date=recipe.pub_date)
+         for user_id in follower_ids.iterator()],
+        batch_size=FeedConstants.BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def refan_out_recipe(recipe):
+    """Перекладывает рецепт в ленты подписчиков нового автора после
+    смены автора, например в админке."""
+    TimelineEntry.objects.filter(recipe_id=recipe.id).delete()
+    fan_out_recipe(recipe)
+
+
+def backfill_timeline(user_id, author_ids):
+    """Добавляет в ленту последние рецепты авторов, например
+    после подписки на них."""
+    recipes = Recipe.objects.limit_per_author(author_ids,
+                                              FeedConstants.BACKFILL_SIZE)
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, recipe_id=recipe.id,
+                       author_id=recipe.author_id, pub_date=recipe.pub_date)
+         for recipe in recipes],
+        ignore_conflicts=True
+    )
+
+
+def prune_timeline(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id=author_id).delete()
+
+
+def pull_timeline(user):
+    """Забирает в ленту рецепты популярных авторов, опубликованные
+    после последней записи ленты от каждого из них.
+
+    Возвращает True, если в ленту что-то добавлено."""
+    author_ids = list(Subscription.objects.filter(
+        user=user,
+        author__followers_count__gte=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).values_list('author_id', flat=True))
+    if not author_ids:
+        return False
+    last_dates = dict(TimelineEntry.objects.filter(
+        user=user, author_id__in=author_ids
+    ).values('author_id').annotate(
+        last_date=Max('pub_date')
+    ).values_list('author_id', 'last_date').order_by())
+    new_authors = [author_id for author_id in author_ids
+                   if author_id not in last_dates]
+    if new_authors:
+        backfill_timeline(user.id, new_authors)
+    if not last_dates:
+        return bool(new_authors)
+    recipes = list(Recipe.objects.filter(reduce(or_, (
+        Q(author_id=author_id, pub_date__gt=last_date)
+        for author_id, last_date in last_dates.items()
+    ))).values_list('id', 'author_id', 'pub_date'))
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user.id, recipe_id=recipe_id,
+                       author_id=author_id, pub_date=pub_date)
+         for recipe_id, author_id, pub_date in recipes],
+        ignore_conflicts=True
+    )
+    return bool(new_authors or recipes)
@@ -0,0 +1,38 @@
+from users.models import User
+
+
+class AdminChangelistTestMixin:
+    """Проверяет, что число запросов страниц списков в админке не
+    зависит от количества строк в таблице.
+
+    Наследники задают `changelists` (адрес страницы и ожидаемое число
+    запросов) и `populate`, который добавляет `count` строк."""
+
+    changelists = {}
+    row_counts = (2, 20)
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin',
+            first_name='Имя', last_name='Фамилия', password='password'
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def populate(self, count):
+        raise NotImplementedError
+
+    def test_changelist_queries(self):
+        rows = 0
+        for count in self.row_counts:
+            self.populate(count)
+            rows += count
+            for url, queries in self.changelists.items():
+                with self.subTest(url=url, rows=rows):
+                    with self.assertNumQueries(queries):
+                        response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
@@ -41,6 +41,15 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+REQUEST_TIMING = os.getenv('REQUEST_TIMING', 'False') == 'True'
+REQUEST_TIMING_SLOW_MS = int(os.getenv('REQUEST_TIMING_SLOW_MS', 0))
+REQUEST_TIMING_SLOWEST_QUERIES = int(
+    os.getenv('REQUEST_TIMING_SLOWEST_QUERIES', 5)
+)
+
+if REQUEST_TIMING:
+    MIDDLEWARE.insert(0, 'core.middleware.RequestTimingMiddleware')
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -68,6 +77,12 @@ if os.getenv('TEST_DB') == 'True':
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+    if os.getenv('TEST_DB_REPLICA'):
+        DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / os.getenv('TEST_DB_REPLICA'),
+            'TEST': {'MIRROR': 'default'},
+        }
 else:
     DATABASES = {
         'default': {
@@ -79,7 +94,42 @@ else:
             'PORT': os.getenv('DB_PORT', 5432)
         }
     }
+    if os.getenv('REPLICA_DB_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.getenv('REPLICA_DB_HOST'),
+            'PORT': os.getenv('REPLICA_DB_PORT', 5432),
+            'TEST': {'MIRROR': 'default'},
+        }
+
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
+if 'replica' in DATABASES:
+    DATABASE_ROUTERS = ('core.routers.ReplicaRouter',)
+    MIDDLEWARE.append('core.middleware.ReplicaPinningMiddleware')
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND',
+                             'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+if CACHES['default']['BACKEND'].endswith('LocMemCache'):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+    }
+
+DATA_VERSION_TIMEOUT = int(os.getenv('DATA_VERSION_TIMEOUT', 5))
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', 300))
+
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('FEED_FANOUT_MAX_FOLLOWERS',
+                                          10000))
 
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 300))
+TOKEN_CACHE_ALIAS = os.getenv('TOKEN_CACHE_ALIAS')
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -123,9 +173,18 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageNumberPaginator',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 DJOSER = {
@@ -140,3 +199,19 @@ DJOSER = {
         'user': ('api.permissions.IsAuthorOrReadOnly',)
     }
 }
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.middleware': {
+            'handlers': ('console',),
+            'level': 'INFO',
+        },
+    },
+}
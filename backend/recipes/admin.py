@@ -5,7 +5,9 @@ from django.forms import models
 from django.utils.safestring import mark_safe
 from rest_framework.authtoken.models import TokenProxy
 
+from core.admin_filters import input_filter
 from core.constants import RecipeConstants
+from core.services import refreshing_shopping_lists
 from .models import (Tag,
                      Recipe,
                      Ingredient,
@@ -35,6 +37,7 @@ class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     min_num = RecipeConstants.MIN_VALUE
     formset = BaseIngredientTagFormSet
+    autocomplete_fields = ('ingredient',)
 
 
 class TagRecipeInLine(admin.TabularInline):
@@ -43,6 +46,23 @@ class TagRecipeInLine(admin.TabularInline):
     formset = BaseIngredientTagFormSet
 
 
+class ShoppingListsAdminMixin:
+    """Пересчитывает списки покупок один раз на изменение или удаление
+    в админке, а не по сигналу на каждую строку ингредиентов."""
+
+    recipe_field = 'id'
+
+    def delete_model(self, request, obj):
+        with refreshing_shopping_lists((getattr(obj, self.recipe_field),)):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with refreshing_shopping_lists(list(queryset.values_list(
+            self.recipe_field, flat=True
+        ))):
+            super().delete_queryset(request, queryset)
+
+
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'color', 'slug')
@@ -51,20 +71,31 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(ShoppingListsAdminMixin, admin.ModelAdmin):
     list_display = ('id',
                     'name',
                     'author',
                     'get_favorites',
                     'get_ingredients',
                     'get_image')
-    search_fields = ('name', 'author')
-    list_filter = ('name', 'author', 'tags')
+    search_fields = ('name', 'author__username')
+    list_filter = ('tags',
+                   input_filter('author__username', 'имени автора'))
+    list_select_related = ('author',)
+    autocomplete_fields = ('author',)
+    show_full_result_count = False
     inlines = (RecipeIngredientInline, TagRecipeInLine)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('ingredients')
+
+    def save_related(self, request, form, formsets, change):
+        with refreshing_shopping_lists((form.instance.id,)):
+            super().save_related(request, form, formsets, change)
+
     @admin.display(description=RecipeConstants.FAVORITES_DESCRIPTION)
     def get_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     @admin.display(description=RecipeConstants.IMAGE_DESCRIPTION)
     def get_image(self, obj):
@@ -72,28 +103,42 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @admin.display(description=RecipeConstants.INGREDIENTS_DESCRIPTION)
     def get_ingredients(self, obj):
-        return ', '.join([i.name for i in obj.ingredients.all()])
+        return ', '.join(i.name for i in obj.ingredients.all())
 
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'measurement_unit')
     search_fields = ('name',)
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
 
 
 @admin.register(RecipeIngredient)
-class RecipeIngredientAdmin(admin.ModelAdmin):
+class RecipeIngredientAdmin(ShoppingListsAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'recipe', 'ingredient', 'amount')
-    search_fields = ('recipe', 'ingredient')
-    list_filter = ('recipe', 'ingredient')
+    search_fields = ('recipe__name', 'ingredient__name')
+    list_filter = (input_filter('recipe__name', 'названию рецепта'),
+                   input_filter('ingredient__name', 'названию ингредиента'))
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+    show_full_result_count = False
+    recipe_field = 'recipe_id'
+
+    def save_model(self, request, obj, form, change):
+        recipe_ids = {obj.recipe_id, form.initial.get('recipe')} - {None}
+        with refreshing_shopping_lists(recipe_ids):
+            super().save_model(request, obj, form, change)
 
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
-    search_fields = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
+    list_filter = (input_filter('user__username', 'имени пользователя'),
+                   input_filter('recipe__name', 'названию рецепта'))
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    show_full_result_count = False
 
 
 admin.site.unregister(TokenProxy)
@@ -0,0 +1,134 @@
+"""Полнотекстовый индекс рецептов.
+
+В PostgreSQL это генерируемый столбец tsvector с GIN-индексом,
+в SQLite (режим TEST_DB) — внешняя таблица FTS5, которую обновляют
+триггеры."""
+
+import re
+
+POSTGRESQL_CONFIG = 'russian'
+SQLITE_TABLE = 'recipes_recipe_fts'
+
+POSTGRESQL_CREATE = (
+    f"""
+    ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{POSTGRESQL_CONFIG}',
+                              coalesce(name, '')), 'A')
+        || setweight(to_tsvector('{POSTGRESQL_CONFIG}',
+                                 coalesce(text, '')), 'B')
+    ) STORED
+    """,
+    """
+    CREATE INDEX recipes_recipe_search_vector_idx
+    ON recipes_recipe USING GIN (search_vector)
+    """,
+)
+POSTGRESQL_DROP = (
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector_idx',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+)
+
+SQLITE_CREATE_TABLE = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5(
+        name, text, content='recipes_recipe', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+)
+SQLITE_TRIGGERS = {
+    f'{SQLITE_TABLE}_insert': f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_TABLE}_insert
+    AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO {SQLITE_TABLE}(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    f'{SQLITE_TABLE}_delete': f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_TABLE}_delete
+    AFTER DELETE ON recipes_recipe BEGIN
+        INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """,
+    f'{SQLITE_TABLE}_update': f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_TABLE}_update
+    AFTER UPDATE OF name, text ON recipes_recipe BEGIN
+        INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO {SQLITE_TABLE}(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+}
+SQLITE_REBUILD = (
+    f"INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}) VALUES ('rebuild')"
+)
+SQLITE_DROP = (
+    *(f'DROP TRIGGER IF EXISTS {name}' for name in SQLITE_TRIGGERS),
+    f'DROP TABLE IF EXISTS {SQLITE_TABLE}',
+)
+
+POSTGRESQL_MATCH = (
+    f"recipes_recipe.search_vector @@ "
+    f"websearch_to_tsquery('{POSTGRESQL_CONFIG}', %s)"
+)
+POSTGRESQL_RANK = (
+    f"ts_rank(recipes_recipe.search_vector, "
+    f"websearch_to_tsquery('{POSTGRESQL_CONFIG}', %s))"
+)
+SQLITE_MATCH = (
+    f'recipes_recipe.id IN (SELECT rowid FROM {SQLITE_TABLE} '
+    f'WHERE {SQLITE_TABLE} MATCH %s)'
+)
+SQLITE_RANK = (
+    f'(SELECT -bm25({SQLITE_TABLE}, 4.0, 1.0) FROM {SQLITE_TABLE} '
+    f'WHERE {SQLITE_TABLE} MATCH %s AND rowid = recipes_recipe.id)'
+)
+
+
+def to_sqlite_query(query):
+    """Превращает пользовательский ввод в запрос FTS5: каждое слово
+    ищется как префикс, все слова должны присутствовать."""
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', query))
+
+
+def create_search_index(schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        statements = POSTGRESQL_CREATE
+    elif schema_editor.connection.vendor == 'sqlite':
+        statements = (*SQLITE_CREATE_TABLE, *SQLITE_TRIGGERS.values(),
+                      SQLITE_REBUILD)
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(schema_editor):
+    statements = {
+        'postgresql': POSTGRESQL_DROP,
+        'sqlite': SQLITE_DROP,
+    }.get(schema_editor.connection.vendor, ())
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def restore_sqlite_triggers(connection):
+    """SQLite пересоздаёт таблицу при многих изменениях схемы и теряет
+    её триггеры, поэтому после миграций они восстанавливаются, а индекс
+    перестраивается."""
+    with connection.cursor() as cursor:
+        tables = connection.introspection.table_names(cursor)
+        if SQLITE_TABLE not in tables:
+            return
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+        )
+        existing = {name for name, in cursor.fetchall()}
+        if existing.issuperset(SQLITE_TRIGGERS):
+            return
+        for statement in SQLITE_TRIGGERS.values():
+            cursor.execute(statement)
+        cursor.execute(SQLITE_REBUILD)
@@ -0,0 +1,28 @@
+# Generated by Django 3.2 on 2026-10-18 04:05
+
+from django.db import migrations, models
+
+
+def delete_recipe_data_versions(apps, schema_editor):
+    """Версии рецептов и авторов раньше хранились в DataVersion."""
+    DataVersion = apps.get_model('core', 'DataVersion')
+    DataVersion.objects.filter(namespace__startswith='recipe:').delete()
+    DataVersion.objects.filter(namespace__startswith='author:').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_data_version'),
+        ('recipes', '0008_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Растёт при каждом изменении рецепта, его тэгов, ингредиентов и автора и входит в ключ кеша ответа.', verbose_name='Версия'),
+        ),
+        migrations.RunPython(delete_recipe_data_versions,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+from itertools import islice
+
+from django.db import migrations
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+BACKFILL_SIZE = 20
+BATCH_SIZE = 1000
+
+
+def get_latest_recipes(Recipe, author_ids):
+    """Последние BACKFILL_SIZE рецептов каждого автора, как в
+    RecipeQuerySet.limit_per_author, который недоступен в миграциях."""
+    queryset = Recipe.objects.filter(author_id__in=author_ids).annotate(
+        author_position=Window(
+            expression=RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('pub_date').desc(), F('id').desc()),
+        )
+    )
+    sql, params = queryset.query.sql_with_params()
+    recipes_by_author = {}
+    for recipe in Recipe.objects.raw(
+        f'SELECT * FROM ({sql}) AS limited_recipes '
+        f'WHERE author_position <= %s',
+        (*params, BACKFILL_SIZE)
+    ):
+        recipes_by_author.setdefault(recipe.author_id, []).append(recipe)
+    return recipes_by_author
+
+
+def fill_timelines(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('users', 'Subscription')
+    TimelineEntry = apps.get_model('recipes', 'TimelineEntry')
+    author_ids = list(Subscription.objects.order_by(
+        'author_id'
+    ).values_list('author_id', flat=True).distinct())
+    for start in range(0, len(author_ids), BATCH_SIZE):
+        recipes_by_author = get_latest_recipes(
+            Recipe, author_ids[start:start + BATCH_SIZE]
+        )
+        entries = (
+            TimelineEntry(user_id=user_id, recipe_id=recipe.id,
+                          author_id=author_id, pub_date=recipe.pub_date)
+            for user_id, author_id in Subscription.objects.filter(
+                author_id__in=recipes_by_author
+            ).values_list('user_id', 'author_id').iterator()
+            for recipe in recipes_by_author[author_id]
+        )
+        while batch := list(islice(entries, BATCH_SIZE)):
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_version'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
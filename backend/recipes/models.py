@@ -1,13 +1,33 @@
 from colorfield.fields import ColorField
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
-from django.db.models import OuterRef, Exists
+from django.db import connection, models
+from django.db.models import (BooleanField,
+                              Exists,
+                              F,
+                              FloatField,
+                              OuterRef,
+                              Prefetch,
+                              Window)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 
 from core.constants import RecipeConstants
 from core.models import UserRecipeBaseModel
+from recipes import fulltext
 
 
 class RecipeQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.select_related(
+            'author'
+        ).prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch('recipeingredients',
+                     queryset=RecipeIngredient.objects.select_related(
+                         'ingredient'
+                     ).order_by('id'))
+        )
+
     def get_recipe_filters(self, user):
         return self.annotate(
             is_favorited=Exists(Favorite.objects.filter(
@@ -20,6 +40,60 @@ class RecipeQuerySet(models.QuerySet):
             ))
         ).order_by('-pub_date')
 
+    def with_any_tag(self, tags):
+        return self.filter(Exists(TagRecipe.objects.filter(
+            recipe_id=OuterRef('pk'),
+            tag__in=tags
+        )))
+
+    def favorited_by(self, user):
+        """Избранное пользователя невелико, поэтому выборка начинается
+        с индекса Favorite(user, recipe), а не с обхода рецептов."""
+        return self.filter(pk__in=Favorite.objects.filter(
+            user_id=user.id
+        ).values('recipe_id'))
+
+    def in_shopping_cart_of(self, user):
+        return self.filter(pk__in=ShoppingCart.objects.filter(
+            user_id=user.id
+        ).values('recipe_id'))
+
+    def search(self, query):
+        """Полнотекстовый поиск по названию и описанию с сортировкой
+        по релевантности."""
+        if connection.vendor == 'postgresql':
+            match, rank = fulltext.POSTGRESQL_MATCH, fulltext.POSTGRESQL_RANK
+        else:
+            query = fulltext.to_sqlite_query(query)
+            if not query:
+                return self.none()
+            match, rank = fulltext.SQLITE_MATCH, fulltext.SQLITE_RANK
+        return self.filter(
+            RawSQL(match, (query,), output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(rank, (query,), output_field=FloatField())
+        ).order_by('-search_rank', '-pub_date')
+
+    def limit_per_author(self, author_ids, limit):
+        """Последние `limit` рецептов каждого автора одним запросом.
+
+        Django не умеет фильтровать по оконным функциям, поэтому
+        запрос с ROW_NUMBER() оборачивается во внешний SELECT."""
+        queryset = self.filter(author_id__in=author_ids).annotate(
+            author_position=Window(
+                expression=RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            )
+        )
+        sql, params = queryset.query.sql_with_params()
+        return self.raw(
+            f'SELECT * FROM ({sql}) AS limited_recipes '
+            f'WHERE author_position <= %s '
+            f'ORDER BY author_id, author_position',
+            (*params, limit)
+        )
+
 
 class Tag(models.Model, RecipeConstants):
     name = models.CharField(
@@ -65,6 +139,16 @@ class Recipe(models.Model):
         'Изображение',
         upload_to='recipes/',
     )
+    image_thumbnail = models.ImageField(
+        'Миниатюра изображения',
+        upload_to='recipes/variants/',
+        blank=True,
+    )
+    image_medium = models.ImageField(
+        'Изображение среднего размера',
+        upload_to='recipes/variants/',
+        blank=True,
+    )
     name = models.CharField(
         'Название рецепта',
         max_length=RecipeConstants.MAX_STR_LENGTH,
@@ -93,6 +177,23 @@ class Recipe(models.Model):
     )
     pub_date = models.DateTimeField('Дата публикации',
                                     auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        RecipeConstants.FAVORITES_DESCRIPTION,
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'В корзинах',
+        default=0,
+        editable=False,
+    )
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=0,
+        editable=False,
+        help_text='Растёт при каждом изменении рецепта, его тэгов, '
+                  'ингредиентов и автора и входит в ключ кеша ответа.',
+    )
 
     objects = RecipeQuerySet.as_manager()
 
@@ -101,6 +202,12 @@ class Recipe(models.Model):
         verbose_name_plural = 'Рецепты'
         default_related_name = '%(class)ss'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=('-pub_date', '-id'),
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=('author', '-pub_date'),
+                         name='recipe_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.name[:RecipeConstants.STR_RETURN_VALUE]
@@ -154,6 +261,40 @@ class ShoppingCart(UserRecipeBaseModel):
                 f' {self.recipe.name} в список покупок.')
 
 
+class ShoppingListItem(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя.
+
+    Поддерживается в актуальном состоянии при изменении списка покупок
+    и ингредиентов рецептов, находящихся в нём."""
+
+    user = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField('Общее количество')
+
+    class Meta:
+        default_related_name = '%(class)ss'
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='%(app_label)s_%(class)s уже существует.',
+            )
+        ]
+
+    def __str__(self):
+        return (f'{self.ingredient.name} - {self.amount}'
+                f'{self.ingredient.measurement_unit}')
+
+
 class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(
         Recipe,
@@ -185,6 +326,10 @@ class RecipeIngredient(models.Model):
         default_related_name = '%(class)ss'
         verbose_name = 'Ингредиент рецепта'
         verbose_name_plural = 'Ингредиенты рецепта'
+        indexes = [
+            models.Index(fields=('recipe', 'ingredient', 'amount'),
+                         name='recipeingredient_covering_idx'),
+        ]
 
     def __str__(self):
         return self.recipe.name[:RecipeConstants.STR_RETURN_VALUE]
@@ -206,6 +351,62 @@ class TagRecipe(models.Model):
         default_related_name = '%(class)ss'
         verbose_name = 'Тэг рецепта'
         verbose_name_plural = 'Тэги рецепта'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'tag'),
+                name='%(app_label)s_%(class)s уже существует.',
+            )
+        ]
+        indexes = [
+            models.Index(fields=('tag', 'recipe'),
+                         name='tagrecipe_tag_recipe_idx'),
+        ]
 
     def __str__(self):
         return self.tag.name[:RecipeConstants.STR_RETURN_VALUE]
+
+
+class TimelineEntry(models.Model):
+    """Рецепт в ленте подписок пользователя.
+
+    Автор и дата публикации повторяют данные рецепта, чтобы лента
+    читалась и очищалась по индексам без соединения с рецептами."""
+
+    user = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='%(app_label)s_%(class)s уже существует.',
+            )
+        ]
+        indexes = [
+            models.Index(fields=('user', '-pub_date', '-id'),
+                         name='timeline_user_pub_date_idx'),
+            models.Index(fields=('user', 'author', '-pub_date'),
+                         name='timeline_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return self.recipe.name[:RecipeConstants.STR_RETURN_VALUE]
@@ -0,0 +1,226 @@
+from django.db import connections, transaction
+from django.db.models.signals import (m2m_changed,
+                                      post_delete,
+                                      post_migrate,
+                                      post_save,
+                                      pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.cache import bump_data_version
+from core.constants import CacheConstants
+from core.images import schedule_image_variants
+from core.services import (change_counter,
+                           discard_recipe_versions_bump,
+                           fan_out_recipe,
+                           get_old_value,
+                           get_old_values,
+                           get_recipe_amounts,
+                           move_counter,
+                           refan_out_recipe,
+                           refresh_shopping_lists,
+                           schedule_recipe_versions_bump,
+                           shopping_lists_updated,
+                           update_shopping_lists)
+from recipes.fulltext import restore_sqlite_triggers
+from recipes.models import (Favorite,
+                            Ingredient,
+                            Recipe,
+                            RecipeIngredient,
+                            ShoppingCart,
+                            Tag,
+                            TagRecipe)
+from users.models import User
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tags_version(**kwargs):
+    transaction.on_commit(
+        lambda: bump_data_version(CacheConstants.TAGS_NAMESPACE)
+    )
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_ingredients_version(**kwargs):
+    transaction.on_commit(
+        lambda: bump_data_version(CacheConstants.INGREDIENTS_NAMESPACE)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def bump_recipe_version(instance, created, **kwargs):
+    """У нового рецепта ещё нет ответов в кеше, а удалённый рецепт
+    больше не попадает в ответы."""
+    if not created:
+        schedule_recipe_versions_bump((instance.id,))
+
+
+@receiver(post_delete, sender=Recipe)
+def discard_recipe_version(instance, **kwargs):
+    """Строки тэгов и ингредиентов удаляются каскадно раньше рецепта
+    и успевают запланировать повышение его версии."""
+    discard_recipe_versions_bump(instance.id)
+
+
+@receiver(pre_save, sender=TagRecipe)
+def remember_tag_recipe(instance, **kwargs):
+    instance.old_values = get_old_values(instance, 'recipe_id')
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+@receiver((post_save, post_delete), sender=TagRecipe)
+def bump_related_recipe_version(instance, **kwargs):
+    """Тэги и ингредиенты можно изменить и без сохранения рецепта,
+    например в админке, поэтому версия рецепта, а если строка
+    перенесена в другой рецепт, то и версия старого рецепта,
+    повышается и здесь."""
+    recipe_ids = {instance.recipe_id}
+    if getattr(instance, 'old_values', None) is not None:
+        recipe_ids.add(instance.old_values['recipe_id'])
+    schedule_recipe_versions_bump(recipe_ids)
+
+
+@receiver(m2m_changed, sender=TagRecipe)
+def bump_tagged_recipe_version(instance, action, reverse, pk_set, **kwargs):
+    """Изменения через менеджеры recipe.tags и tag.recipes не вызывают
+    сигналов сохранения TagRecipe."""
+    if not reverse:
+        if action.startswith('post_'):
+            schedule_recipe_versions_bump((instance.id,))
+    elif action == 'pre_clear':
+        schedule_recipe_versions_bump(TagRecipe.objects.filter(
+            tag=instance
+        ).values_list('recipe_id', flat=True))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        schedule_recipe_versions_bump(pk_set)
+
+
+@receiver(pre_save, sender=ShoppingCart)
+def remember_shopping_cart(instance, **kwargs):
+    instance.old_values = get_old_values(instance, 'user_id', 'recipe_id')
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    """Если у корзины сменились пользователь или рецепт, например
+    в админке, рецепт переносится из старого списка покупок в новый."""
+    old_values = instance.old_values
+    if old_values is not None:
+        if (old_values['user_id'] == instance.user_id
+                and old_values['recipe_id'] == instance.recipe_id):
+            return
+        update_shopping_lists(
+            (old_values['user_id'],),
+            {ingredient_id: -amount for ingredient_id, amount
+             in get_recipe_amounts(old_values['recipe_id']).items()}
+        )
+    update_shopping_lists((instance.user_id,),
+                          get_recipe_amounts(instance.recipe_id))
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    """Ингредиенты рецепта ещё не удалены, даже если корзина удаляется
+    каскадно вместе с рецептом. Удаление рецептов через API и админку
+    пересчитывает списки покупок само, см. refreshing_shopping_lists."""
+    if shopping_lists_updated.get():
+        return
+    update_shopping_lists(
+        (instance.user_id,),
+        {ingredient_id: -amount for ingredient_id, amount
+         in get_recipe_amounts(instance.recipe_id).items()}
+    )
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_recipe_ingredient(instance, **kwargs):
+    instance.old_values = get_old_values(instance, 'recipe_id')
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def refresh_carted_shopping_lists(instance, **kwargs):
+    """Ингредиенты, изменённые в обход RecipePostSerializer и админки,
+    пересчитываются в списках покупок всех пользователей, у которых
+    рецепт в корзине."""
+    if shopping_lists_updated.get():
+        return
+    recipe_ids = {instance.recipe_id}
+    if getattr(instance, 'old_values', None) is not None:
+        recipe_ids.add(instance.old_values['recipe_id'])
+    refresh_shopping_lists(ShoppingCart.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('user_id', flat=True).distinct())
+
+
+@receiver(post_save, sender=Recipe)
+def update_image_variants(instance, **kwargs):
+    schedule_image_variants(instance)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe(instance, **kwargs):
+    instance.old_values = get_old_values(instance, 'author_id')
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+    else:
+        move_counter(User, 'recipes_count',
+                     get_old_value(instance, 'author_id'), instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+def add_to_timelines(instance, created, **kwargs):
+    if created:
+        fan_out_recipe(instance)
+        return
+    old_author_id = get_old_value(instance, 'author_id')
+    if old_author_id is not None and old_author_id != instance.author_id:
+        refan_out_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(pre_save, sender=Favorite)
+def remember_favorite(instance, **kwargs):
+    instance.old_values = get_old_values(instance, 'recipe_id')
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+    else:
+        move_counter(Recipe, 'favorites_count',
+                     get_old_value(instance, 'recipe_id'), instance.recipe_id)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def increment_in_carts_count(instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'in_carts_count', 1)
+    else:
+        move_counter(Recipe, 'in_carts_count',
+                     get_old_value(instance, 'recipe_id'), instance.recipe_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_in_carts_count(instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'in_carts_count', -1)
+
+
+@receiver(post_migrate)
+def restore_search_index_triggers(sender, using, **kwargs):
+    connection = connections[using]
+    if sender.name == 'recipes' and connection.vendor == 'sqlite':
+        restore_sqlite_triggers(connection)
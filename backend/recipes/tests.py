@@ -0,0 +1,51 @@
+from django.test import TestCase
+
+from core.testing import AdminChangelistTestMixin
+from recipes.models import (Favorite,
+                            Ingredient,
+                            Recipe,
+                            RecipeIngredient,
+                            ShoppingCart,
+                            Tag,
+                            TagRecipe)
+from users.models import User
+
+
+class AdminChangelistTest(AdminChangelistTestMixin, TestCase):
+
+    changelists = {
+        '/admin/recipes/recipe/': 6,
+        '/admin/recipes/recipeingredient/': 4,
+        '/admin/recipes/shoppingcart/': 4,
+        '/admin/recipes/ingredient/': 6,
+        '/admin/recipes/tag/': 8,
+    }
+
+    def populate(self, count):
+        start = Recipe.objects.count()
+        for index in range(start, start + count):
+            author = User.objects.create_user(
+                email=f'author{index}@example.com',
+                username=f'author{index}', first_name='Имя',
+                last_name='Фамилия', password='password'
+            )
+            tag = Tag.objects.create(name=f'Тэг {index}',
+                                     color=f'#{index:06X}',
+                                     slug=f'tag-{index}')
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {index}',
+                text='Описание рецепта', cooking_time=5,
+                image='recipes/image.png'
+            )
+            TagRecipe.objects.create(recipe=recipe, tag=tag)
+            for number in range(2):
+                RecipeIngredient.objects.create(
+                    recipe=recipe,
+                    ingredient=Ingredient.objects.create(
+                        name=f'Ингредиент {index}.{number}',
+                        measurement_unit='г'
+                    ),
+                    amount=10
+                )
+            Favorite.objects.create(user=self.admin, recipe=recipe)
+            ShoppingCart.objects.create(user=author, recipe=recipe)
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
+from core.admin_filters import input_filter
 from core.constants import UserConstants
 from users.models import User
 from .models import Subscription
@@ -16,19 +17,24 @@ class UserAdmin(BaseUserAdmin):
                     'get_recipes',
                     'get_subscribers')
     search_fields = ('username', 'email', 'first_name', 'last_name')
-    list_filter = ('username', 'email')
+    list_filter = ('is_staff', 'is_active')
+    show_full_result_count = False
 
     @admin.display(description=UserConstants.RECIPES_AMOUNT)
     def get_recipes(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     @admin.display(description=UserConstants.SUBSCRIBERS_AMOUNT)
     def get_subscribers(self, obj):
-        return obj.following.count()
+        return obj.followers_count
 
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'author')
-    search_fields = ('user', 'author')
-    list_filter = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    list_filter = (input_filter('user__username', 'имени подписчика'),
+                   input_filter('author__username', 'имени автора'))
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    show_full_result_count = False
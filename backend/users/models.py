@@ -44,6 +44,22 @@ class User(AbstractUser):
         help_text='Фамилия',
     )
 
+    recipes_count = models.PositiveIntegerField(
+        UserConstants.RECIPES_AMOUNT,
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        UserConstants.SUBSCRIBERS_AMOUNT,
+        default=0,
+        editable=False,
+    )
+    following_count = models.PositiveIntegerField(
+        UserConstants.SUBSCRIPTIONS_AMOUNT,
+        default=0,
+        editable=False,
+    )
+
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
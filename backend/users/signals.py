@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.authentication import token_cache
+from core.constants import CacheConstants
+from core.services import (backfill_timeline,
+                           bump_author_recipe_versions,
+                           change_counter,
+                           get_old_value,
+                           get_old_values,
+                           move_counter,
+                           prune_timeline)
+from users.models import Subscription, User
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, **kwargs):
+    token_key = instance.key
+    transaction.on_commit(lambda: token_cache.delete(token_key))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(instance, created, **kwargs):
+    """Смена пароля, блокировка и любое другое изменение пользователя
+    сбрасывают закешированные токены, чтобы в запросах не оказался
+    устаревший пользователь."""
+    if created:
+        return
+    token_keys = list(Token.objects.filter(
+        user=instance
+    ).values_list('key', flat=True))
+    if token_keys:
+        transaction.on_commit(lambda: token_cache.delete(*token_keys))
+
+
+@receiver(post_save, sender=User)
+def bump_author_version(instance, created, update_fields, **kwargs):
+    """Сохранение только служебных полей, например last_login при входе,
+    не меняет ответов с рецептами автора."""
+    if created or (update_fields is not None
+                   and not update_fields & CacheConstants.AUTHOR_FIELDS):
+        return
+    transaction.on_commit(lambda: bump_author_recipe_versions(instance.id))
+
+
+@receiver(pre_save, sender=Subscription)
+def remember_subscription(instance, **kwargs):
+    instance.old_values = get_old_values(instance, 'user_id', 'author_id')
+
+
+@receiver(post_save, sender=Subscription)
+def increment_subscription_counters(instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'followers_count', 1)
+        change_counter(User, instance.user_id, 'following_count', 1)
+        return
+    move_counter(User, 'followers_count',
+                 get_old_value(instance, 'author_id'), instance.author_id)
+    move_counter(User, 'following_count',
+                 get_old_value(instance, 'user_id'), instance.user_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_subscription_counters(instance, **kwargs):
+    change_counter(User, instance.author_id, 'followers_count', -1)
+    change_counter(User, instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_subscriber_timeline(instance, created, **kwargs):
+    if not created:
+        old_values = getattr(instance, 'old_values', None)
+        if not old_values or (
+            old_values['user_id'] == instance.user_id
+            and old_values['author_id'] == instance.author_id
+        ):
+            return
+        prune_timeline(old_values['user_id'], old_values['author_id'])
+    backfill_timeline(instance.user_id, (instance.author_id,))
+
+
+@receiver(post_delete, sender=Subscription)
+def prune_subscriber_timeline(instance, **kwargs):
+    prune_timeline(instance.user_id, instance.author_id)
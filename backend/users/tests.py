@@ -0,0 +1,22 @@
+from django.test import TestCase
+
+from core.testing import AdminChangelistTestMixin
+from users.models import Subscription, User
+
+
+class AdminChangelistTest(AdminChangelistTestMixin, TestCase):
+
+    changelists = {
+        '/admin/users/user/': 4,
+        '/admin/users/subscription/': 4,
+    }
+
+    def populate(self, count):
+        start = User.objects.count()
+        for index in range(start, start + count):
+            user = User.objects.create_user(
+                email=f'user{index}@example.com', username=f'user{index}',
+                first_name='Имя', last_name='Фамилия', password='password'
+            )
+            Subscription.objects.create(user=user, author=self.admin)
+            Subscription.objects.create(user=self.admin, author=user)